@@ -1,6 +1,9 @@
 from fatal_error_handler import install_tkinter_error_hook
 install_tkinter_error_hook()
 
+from startup_timer import get_startup_timer
+startup_timer = get_startup_timer()
+
 
 import customtkinter as ctk
 from tkinter import filedialog
@@ -10,17 +13,24 @@ import json
 from threading import Event
 from datetime import datetime
 import traceback
-from logger_config import get_logger
+from logger_config import get_logger, get_image_logger, configure_logging
 logger = get_logger()
+image_logger = get_image_logger()
 
 from thread_manager import ThreadManager
 from model_manager import ModelManager
-from processing_manager import ProcessingManager
+from render_scheduler import FrameMailbox, RenderScheduler, UIEventBus
+from grid_canvas import GridCanvas
+from production_lines import load_line_configs
+# processing_manager (cv2, watchdog, the inference backends) is imported lazily in the background,
+# so the window comes up before the heavy imports and the model load.
 
 
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning, module="torch.jit")
 
+startup_timer.mark("imports")
+
 logo_ico = "resources/images/logo.ico"
 logo_light = "resources/images/FastDoc-Light-Mode.png"
 
@@ -32,45 +42,57 @@ dark_grey_button = '#4c4084'
 light_blue_color = "#9370DB"
 dark_blue_color = "#4B0082"
 
+class LineView:
+    """Counters and pallet grid of one production line, kept for every line so switching lines is instant."""
+
+    def __init__(self, name, grid_config):
+        self.name = name
+        self.rows = grid_config["rows"]
+        self.columns = grid_config["columns"]
+        self.total_components = 0
+        self.ok_components = 0
+        self.nok_components = 0
+        self.grid_data = {}
+        self.dirty_cells = set()
+        self.pallet_complete = False
+        self.model_state = "not loaded"
+
+
 class TestApp(ctk.CTk):
 
-    def __init__(self):
+    def __init__(self, config_path="config.json"):
         super().__init__()
 
+        self.config_path = config_path
         try:
-            with open("config.json", "r") as config_file:
+            with open(config_path, "r") as config_file:
                 config = json.load(config_file)
             logger.success("Configuration loaded successfully.")
         except Exception as e:
             logger.exception("Failed to load configuration.")
             raise
         
-        self.watch_single_folder_path = config["watch_single_folder_path"]  
+        configure_logging(config)
         initial_model_path = config.get("initial_model_path")
-        self.grid_config = config["grid_config"]
-        self.rows = self.grid_config["rows"]
-        self.columns = self.grid_config["columns"]
-        self.total_pieces = self.grid_config["total_pieces"]
+        self.line_configs = load_line_configs(config)
+        self.line_views = {line["name"]: LineView(line["name"], line["grid_config"]) for line in self.line_configs}
+        self.active_line = self.line_configs[0]["name"]
         self.enable_grid = config["enable_grid"]
+        self.ui_max_fps = config.get("ui_max_fps", 15)
+        self.ui_event_interval_ms = config.get("ui_event_interval_ms", 100)
 
 
-        self.model_manager = ModelManager(initial_model_path) 
+        self.model_manager = ModelManager(initial_model_path, config.get("model_pool_memory_mb", 1024))
         self.thread_manager = ThreadManager()
 
         self.image_doc = None
         self.shutdown_event = Event()
 
 
-        self.total_components = 0
-        self.ok_components = 0
-        self.nok_components = 0
-
         self.total_components_label = None
         self.ok_components_label = None
         self.nok_components_label = None
 
-        self.grid_data = {}
-
         self.title("Inspection App")
         self.iconbitmap(logo_ico)
         self.geometry(self.center_window(1400, 900))
@@ -85,6 +107,17 @@ class TestApp(ctk.CTk):
 
         self.create_widgets()
         self.state("zoomed")
+
+        self.frame_mailbox = FrameMailbox()
+        self.render_scheduler = RenderScheduler(
+            self, self.frame_mailbox,
+            lambda image: self.display_image_on_canvas(image, self.canvas),
+            max_fps=self.ui_max_fps
+        )
+        self.render_scheduler.start()
+
+        self.ui_events = UIEventBus()
+        self.ui_events_after_id = self.after(self.ui_event_interval_ms, self.process_ui_events)
         
 
 
@@ -97,9 +130,13 @@ class TestApp(ctk.CTk):
     def exit_app(self):
         logger.info("Exiting application and stopping all threads...")
         self.shutdown_event.set()
+        self.render_scheduler.stop()
+        self.after_cancel(self.ui_events_after_id)
+        logger.info(f"Rendered {self.render_scheduler.rendered_count} frames, "
+                    f"dropped {self.frame_mailbox.dropped_count} stale frames.")
 
         try:
-            self.processing_manager.stop_monitoring()
+            self.production_lines.stop_monitoring()
         except Exception as e:
             logger.error(f"Error stopping monitoring: {e}")
 
@@ -197,6 +234,17 @@ class TestApp(ctk.CTk):
             )
             self.result_button.grid(row=0, column=3, rowspan=2, padx=10, pady=5, sticky="e")
 
+        self.model_state_label = ctk.CTkLabel(self.buttons_frame, text="Model: not loaded")
+        self.model_state_label.grid(row=0, column=4, rowspan=2, padx=10, pady=5, sticky="e")
+
+        if len(self.line_views) > 1:
+            self.line_var = ctk.StringVar(value=self.active_line)
+            self.line_dropdown = ctk.CTkOptionMenu(
+                self.buttons_frame, variable=self.line_var, values=list(self.line_views),
+                width=120, command=self.select_line
+            )
+            self.line_dropdown.grid(row=0, column=0, rowspan=2, padx=10, pady=5, sticky="w")
+
 
     def create_image_section(self, frame):
         frame.grid_rowconfigure(0, weight=1)
@@ -288,6 +336,7 @@ class TestApp(ctk.CTk):
         model_name = self.model_manager.upload_model()
         if model_name:
             self.model_manager.set_active_model(model_name)
+            self.swap_active_model()
 
     def update_model_dropdown(self):
         model_names = [model["name"] for model in self.model_manager.models_list]
@@ -297,21 +346,41 @@ class TestApp(ctk.CTk):
     def select_model(self, selected_model):
         logger.info(f"Selected model: {selected_model}")
         self.model_manager.set_active_model(selected_model)
+        self.swap_active_model()
+
+    def swap_active_model(self):
+        # Hot-swap into the running pipeline; the watcher and queued images are left untouched.
+        if hasattr(self, "production_lines"):
+            self.production_lines.request_model_swap(self.model_manager.active_model)
 
     def start_monitoring_and_processing(self):
         active_model_path = self.model_manager.active_model
-
-
-        self.processing_manager = ProcessingManager(
-                watch_single_folder_path=self.watch_single_folder_path,
-                model_path=active_model_path,
-                update_callback=self.update_component_counters,
-                shutdown_event=self.shutdown_event,
-                update_grid_callback=self.update_grid_data,
- 
+        self.post_model_state("loading")
+        self.thread_manager.run_in_thread(lambda: self.start_processing_task(active_model_path))
+
+    def start_processing_task(self, active_model_path):
+        with startup_timer.phase("processing_imports"):
+            from production_lines import ProductionLines
+            import processing_manager  # the heavy imports ProductionLines defers; timed as part of this phase
+
+        self.production_lines = ProductionLines(
+                self.config_path,
+                active_model_path,
+                self.shutdown_event,
+                self.line_callbacks,
+                model_pool=self.model_manager.model_pool,
             )
-        self.thread_manager.run_in_thread(self.processing_manager.start_monitoring)
-        self.thread_manager.run_in_thread(lambda: self.processing_manager.process_single_image(self.display_image_callback))
+        # Watching starts right away; images queue up (with backpressure) while the model loads.
+        self.thread_manager.run_in_thread(self.production_lines.start_monitoring)
+        self.production_lines.run({name: (lambda image, line=name: self.display_image_callback(image, line))
+                                   for name in self.line_views})
+
+    def line_callbacks(self, line):
+        return {
+            "update_callback": lambda piece_status: self.post_piece_status(piece_status, line),
+            "update_grid_callback": lambda data: self.post_grid_update(data, line),
+            "model_state_callback": lambda state: self.post_model_state(state, line),
+        }
 
 
 
@@ -325,7 +394,7 @@ class TestApp(ctk.CTk):
         self.stop_monitoring_button.configure(fg_color=button_color_sucesso, hover_color=button_hover_color_sucesso)
 
     def stop_monitoring_button_clicked(self):
-        self.processing_manager.stop_monitoring()
+        self.production_lines.stop_monitoring()
         logger.info("Stopped monitoring.")
 
         self.start_monitoring_button.configure(fg_color=button_color_sucesso, hover_color=button_hover_color_sucesso)
@@ -347,8 +416,8 @@ class TestApp(ctk.CTk):
 
     def display_image_on_canvas(self, image, canvas):
         try:
-            logger.info("Displaying image on canvas...")
-            self.original_image = image.copy()
+            image_logger.info("Displaying image on canvas...")
+            self.original_image = image
             canvas_width = canvas.winfo_width()
             canvas_height = canvas.winfo_height()
             image_width, image_height = image.size
@@ -367,30 +436,74 @@ class TestApp(ctk.CTk):
             canvas.image = tk_image
             canvas.delete("all")
             canvas.create_image(canvas_width // 2, canvas_height // 2, image=tk_image, anchor="center")
-            logger.info("Displayed processed image.")
+            image_logger.info("Displayed processed image.")
         except Exception as e:
             logger.exception("Error displaying image")
 
 
-    def display_image_callback(self, image):
-        self.display_image_on_canvas(image, self.canvas)
+    @property
+    def active_view(self):
+        return self.line_views[self.active_line]
 
-    def update_component_counters(self, piece_status):
-        try:
-            self.total_components += 1
-            total = self.total_components
+    def display_image_callback(self, image, line=None):
+        # Called from the processing thread; the render scheduler draws it on the Tk thread.
+        # Only the line on screen is drawn; the others keep counting in the background.
+        if line is None or line == self.active_line:
+            self.frame_mailbox.post(image)
 
-            self.total_components_label.configure(text=str(total).zfill(7))
+    def post_piece_status(self, piece_status, line=None):
+        # Called from the processing thread; applied on the Tk thread by process_ui_events.
+        self.ui_events.post("counter", (line or self.active_line, piece_status))
 
-            if piece_status == "nok":
-                self.nok_components += 1
-                self.nok_components_label.configure(text=str(self.nok_components).zfill(7))
-            elif piece_status == "ok":
-                self.ok_components += 1
-                self.ok_components_label.configure(text=str(self.ok_components).zfill(7))
-            else:
-                self.nok_components += 1
-                self.nok_components_label.configure(text=str(self.nok_components).zfill(7))
+    def post_grid_update(self, data, line=None):
+        self.ui_events.post("grid", (line or self.active_line, data))
+
+    def post_model_state(self, state, line=None):
+        self.ui_events.post("model_state", (line, state))
+
+    def process_ui_events(self):
+        try:
+            counts = {}
+            grid_updated = False
+
+            for kind, (line, payload) in self.ui_events.drain():
+                if kind == "counter":
+                    ok_nok = counts.setdefault(line, [0, 0])
+                    ok_nok[0 if payload == "ok" else 1] += 1
+                elif kind == "grid":
+                    self.update_grid_data(payload, refresh=False, view=self.line_views[line])
+                    grid_updated = grid_updated or line == self.active_line
+                elif kind == "model_state":
+                    # None comes from the initial "loading" before any line exists: it applies to all.
+                    for view in ([self.line_views[line]] if line else self.line_views.values()):
+                        view.model_state = payload
+                    self.model_state_label.configure(text=f"Model: {self.active_view.model_state}")
+
+            for line, (ok_count, nok_count) in counts.items():
+                self.update_component_counters(ok_count, nok_count, self.line_views[line])
+
+            if grid_updated and hasattr(self, "result_popup") and self.result_popup.winfo_exists():
+                self.refresh_result_popup()
+        except Exception:
+            logger.exception("Error processing UI events")
+        finally:
+            self.ui_events_after_id = self.after(self.ui_event_interval_ms, self.process_ui_events)
+
+    def update_component_counters(self, ok_count, nok_count, view=None):
+        """Apply a tick's worth of results with a single refresh of each label."""
+        view = view or self.active_view
+        try:
+            view.total_components += ok_count + nok_count
+            view.ok_components += ok_count
+            view.nok_components += nok_count
+            if view is not self.active_view:
+                return
+
+            self.total_components_label.configure(text=str(view.total_components).zfill(7))
+            if ok_count:
+                self.ok_components_label.configure(text=str(view.ok_components).zfill(7))
+            if nok_count:
+                self.nok_components_label.configure(text=str(view.nok_components).zfill(7))
 
             self.update_percentages()
 
@@ -399,10 +512,11 @@ class TestApp(ctk.CTk):
 
 
     def update_percentages(self):
-        total = max(self.total_components, 1)
+        view = self.active_view
+        total = max(view.total_components, 1)
 
-        ok_pct = (self.ok_components / total) * 100
-        nok_pct = (self.nok_components / total) * 100
+        ok_pct = (view.ok_components / total) * 100
+        nok_pct = (view.nok_components / total) * 100
 
         self.ok_percent_label.configure(text=f"{ok_pct:.1f}%")
         self.nok_percent_label.configure(text=f"{nok_pct:.1f}%")
@@ -413,9 +527,10 @@ class TestApp(ctk.CTk):
 
 
     def reset_counters(self):
-        self.total_components = 0
-        self.ok_components = 0
-        self.nok_components = 0
+        view = self.active_view
+        view.total_components = 0
+        view.ok_components = 0
+        view.nok_components = 0
 
         self.total_components_label.configure(text="0000000")
         self.ok_components_label.configure(text="0000000")
@@ -444,27 +559,9 @@ class TestApp(ctk.CTk):
             self.result_popup.focus_force()
             self.result_popup.grab_set()
 
-            self.grid_frame = ctk.CTkFrame(self.result_popup)
-            self.grid_frame.pack(expand=True, fill="both", padx=10, pady=10)
-
-            self.grid_widget_map = {}
-
-            for r in range(self.rows):
-                self.grid_frame.grid_rowconfigure(r, weight=1)
-            for c in range(self.columns):
-                self.grid_frame.grid_columnconfigure(c, weight=1)
-
-            for row in range(self.rows):
-                for col in range(self.columns):
-                    lbl = ctk.CTkLabel(
-                        self.grid_frame,
-                        text="undetected",
-                        fg_color="gray",
-                        font=("Arial", 14, "bold"),
-                        anchor="center"
-                    )
-                    lbl.grid(row=row, column=col, padx=2, pady=2, sticky="nsew")
-                    self.grid_widget_map[(row, col)] = lbl
+            self.grid_canvas = GridCanvas(self.result_popup, self.active_view.rows, self.active_view.columns,
+                                          bg="#2b2b2b")
+            self.grid_canvas.pack(expand=True, fill="both", padx=10, pady=10)
 
             def on_close():
                 logger.info("Closing result popup (grid stays alive).")
@@ -472,92 +569,115 @@ class TestApp(ctk.CTk):
 
             self.result_popup.protocol("WM_DELETE_WINDOW", on_close)
 
-        self.refresh_result_popup()
+        self.refresh_result_popup(full=True)
 
 
 
 
 
-    def update_grid_data(self, data):
+    def update_grid_data(self, data, refresh=True, view=None):
         if not self.enable_grid:
             logger.warning("Grid logic is disabled in configuration.")
             return
 
+        view = view or self.active_view
+        is_active = view is self.active_view
+
         if isinstance(data, dict) and "status" not in data:
             logger.info("Received legacy grid data format, treating as complete palette.")
-            self.grid_data = data
-            if hasattr(self, "result_button"):
-                self.result_button.configure(
-                    fg_color="green",
-                    hover_color="#00A651",
-                    text="Show Result (Complete)"
-                )
+            view.dirty_cells.update(view.grid_data, data)
+            view.grid_data = data
+            view.pallet_complete = True
+            if is_active:
+                self.update_result_button(view)
             return
 
         status = data.get("status")
-        logger.info(f"Received grid update message: {status}")
+        if status == "update_cell":
+            image_logger.info("Received grid update message for {}: {}", view.name, status)
+        else:
+            logger.info(f"Received grid update message for {view.name}: {status}")
 
         if status == "start_new_palette":
-            self.grid_data = {}
-            if hasattr(self, "result_button"):
-                self.result_button.configure(
-                    fg_color="red",
-                    hover_color="#FF6347",
-                    text="Show Result (Processing...)"
-                )
+            # Cells of the previous pallet go back to "undetected" on the next refresh.
+            view.dirty_cells.update(view.grid_data)
+            view.grid_data = {}
+            view.pallet_complete = False
+            if is_active:
+                self.update_result_button(view)
             return
 
         if status == "update_cell":
             position = tuple(data["position"])
             piece_status = data["piece_status"]
-            self.grid_data[position] = piece_status
+            view.grid_data[position] = piece_status
+            view.dirty_cells.add(position)
 
-            if hasattr(self, "result_popup") and self.result_popup.winfo_exists():
+            if refresh and is_active and hasattr(self, "result_popup") and self.result_popup.winfo_exists():
                 self.refresh_result_popup()
             return
 
         if status == "palette_complete":
-            self.grid_data = data.get("grid", {})
-            if hasattr(self, "result_button"):
-                self.result_button.configure(
-                    fg_color="green",
-                    hover_color="#00A651",
-                    text="Show Result (Complete)"
-                )
-
-            if hasattr(self, "result_popup") and self.result_popup.winfo_exists():
+            if "grid" in data:
+                grid = {tuple(position): piece_status for position, piece_status in data["grid"].items()}
+                view.dirty_cells.update(view.grid_data, grid)
+                view.grid_data = grid
+            view.pallet_complete = True
+            if is_active:
+                self.update_result_button(view)
+
+            if refresh and is_active and hasattr(self, "result_popup") and self.result_popup.winfo_exists():
                 self.refresh_result_popup()
             return
 
+    def update_result_button(self, view):
+        if not hasattr(self, "result_button"):
+            return
+        if view.pallet_complete:
+            self.result_button.configure(fg_color="green", hover_color="#00A651", text="Show Result (Complete)")
+        else:
+            self.result_button.configure(fg_color="red", hover_color="#FF6347", text="Show Result (Processing...)")
 
-
-    def refresh_result_popup(self):
+    def select_line(self, line):
+        """Show another line's image, counters, pallet grid and model state; every line keeps running."""
+        if line == self.active_line:
+            return
+        logger.info(f"Showing line: {line}")
+        self.active_line = line
+        view = self.active_view
+
+        self.total_components_label.configure(text=str(view.total_components).zfill(7))
+        self.ok_components_label.configure(text=str(view.ok_components).zfill(7))
+        self.nok_components_label.configure(text=str(view.nok_components).zfill(7))
+        self.update_percentages()
+        self.model_state_label.configure(text=f"Model: {view.model_state}")
+        self.update_result_button(view)
+        self.frame_mailbox.take()
+
+        if hasattr(self, "result_popup") and self.result_popup.winfo_exists():
+            if (self.grid_canvas.rows, self.grid_canvas.columns) != (view.rows, view.columns):
+                self.grid_canvas.destroy()
+                self.grid_canvas = GridCanvas(self.result_popup, view.rows, view.columns, bg="#2b2b2b")
+                self.grid_canvas.pack(expand=True, fill="both", padx=10, pady=10)
+            self.refresh_result_popup(full=True)
+
+    def refresh_result_popup(self, full=False):
         if not hasattr(self, "result_popup") or not self.result_popup.winfo_exists():
             logger.warning("Result popup does not exist.")
             return
-        if not hasattr(self, "grid_widget_map"):
-            logger.warning("Grid widget map not found.")
+        if not hasattr(self, "grid_canvas"):
+            logger.warning("Grid canvas not found.")
             return
 
-        logger.info("Refreshing result popup grid...")
-        status_colors = {
-            "ok": "#4CAF50",
-            "nok": "#FF6666",
-            "undetected": "gray",
-        }
-
-        for row in range(self.rows):
-            for col in range(self.columns):
-                status = self.grid_data.get((row, col), "undetected")
-                widget = self.grid_widget_map[(row, col)]
+        view = self.active_view
+        positions = self.grid_canvas.cell_items if full else view.dirty_cells
+        cells = {position: view.grid_data.get(position, "undetected") for position in positions}
+        view.dirty_cells.clear()
 
-                try:
-                    widget.configure(
-                        text=f"{status}\n({row},{col})",
-                        fg_color=status_colors.get(status, "gray")
-                    )
-                except Exception:
-                    logger.exception("Error updating result popup grid.")
+        try:
+            self.grid_canvas.update_cells(cells)
+        except Exception:
+            logger.exception("Error updating result popup grid.")
 
 
 
@@ -565,6 +685,7 @@ class TestApp(ctk.CTk):
 def start_application():
     try:
         app = TestApp()
+        startup_timer.mark("window")
         app.mainloop()
     except KeyboardInterrupt:
         try:
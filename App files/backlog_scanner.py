@@ -0,0 +1,241 @@
+from datetime import datetime
+from threading import Event, Lock, Thread
+import heapq
+import os
+import re
+import time
+
+from logger_config import get_logger
+logger = get_logger()
+
+from image_io import IMAGE_EXTENSIONS
+
+
+CAPTURE_NAME_PATTERN = re.compile(r"(\d{4}_\d{2}_\d{2}_\d{6})_(\d+)\.\w+$")
+
+
+def parse_capture_time(name):
+    """Unix time from a Pic_YYYY_MM_DD_HHMMSS_N camera file name, or None."""
+    match = CAPTURE_NAME_PATTERN.search(name)
+    if match:
+        try:
+            return datetime.strptime(match.group(1), "%Y_%m_%d_%H%M%S").timestamp()
+        except ValueError:
+            pass
+    return None
+
+
+def capture_time(path):
+    """Capture time of an image file: from its name, else its mtime (now if it is gone)."""
+    captured_at = parse_capture_time(os.path.basename(path))
+    if captured_at is not None:
+        return captured_at
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return time.time()
+
+
+def capture_sort_key(entry):
+    """Camera files are named Pic_YYYY_MM_DD_HHMMSS_N; fall back to mtime for anything else."""
+    captured_at = parse_capture_time(entry.name)
+    if captured_at is not None:
+        return captured_at, int(CAPTURE_NAME_PATTERN.search(entry.name).group(2)), entry.name
+    try:
+        return entry.stat().st_mtime, 0, entry.name
+    except OSError:
+        return 0.0, 0, entry.name
+
+
+class ProcessedIndex:
+    """
+    Which images in the watch folder have already been classified. Everything captured at or before
+    `mark` counts as processed; after it, the names of the last max_entries processed files are kept.
+    - No index file yet (first start, or after an upgrade): the mark is 0, so every image already in the
+      folder is backlog, unless skip_existing is set, which starts the mark at now.
+    - When the set is full, the name with the oldest capture time is evicted and the mark moves up to it
+      (processing order is not capture order once live events interleave with the backlog), so old
+      images never come back as backlog however many the folder holds.
+    Names are appended to the file by a background writer every flush_interval, not per image.
+    File format: a "#mark <unix time>" line, then "<name>\t<capture time>" per processed file.
+    """
+
+    def __init__(self, index_path, max_entries=20000, skip_existing=False, flush_interval=1.0):
+        self.index_path = index_path
+        self.max_entries = max_entries
+        self.skip_existing = skip_existing
+        self.flush_interval = flush_interval
+        self.names = {}  # name -> capture time
+        self.by_capture = []  # heap of (capture time, name) over self.names
+        self.mark = 0.0
+        self.lock = Lock()
+        self.pending = []  # (name, capture time) not yet appended to the file
+        self.appended = 0
+        self.load()
+
+        self.stop_event = Event()
+        self.thread = None
+        if self.index_path:
+            self.thread = Thread(target=self.run, name="processed-index", daemon=True)
+            self.thread.start()
+
+    def load(self):
+        if not self.index_path:
+            return
+        if not os.path.exists(self.index_path):
+            if self.skip_existing:
+                self.mark = time.time()
+            try:
+                self.write_file(self.mark, list(self.names.items()))
+                logger.info(f"Created processed index {self.index_path}; images already in the watch folder are "
+                            f"{'treated as processed' if self.skip_existing else 'queued as backlog'}.")
+            except OSError:
+                logger.exception(f"Failed to create processed index: {self.index_path}")
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.rstrip("\n")
+                    if line.startswith("#mark "):
+                        self.mark = max(self.mark, float(line[6:]))
+                        continue
+                    name, _, captured_at = line.partition("\t")
+                    if name and name not in self.names:
+                        self.insert(name, float(captured_at) if captured_at else parse_capture_time(name))
+            while len(self.names) > self.max_entries:
+                self.evict_oldest()
+            self.write_file(self.mark, list(self.names.items()))
+            logger.info(f"Loaded {len(self.names)} processed file names from {self.index_path}")
+        except (OSError, ValueError):
+            logger.exception(f"Failed to load processed index: {self.index_path}")
+
+    def insert(self, name, captured_at):
+        self.names[name] = captured_at
+        # Names without a known capture time go first and never move the mark.
+        heapq.heappush(self.by_capture, (captured_at if captured_at is not None else float("-inf"), name))
+
+    def evict_oldest(self):
+        captured_at, name = heapq.heappop(self.by_capture)
+        del self.names[name]
+        if captured_at != float("-inf"):
+            self.mark = max(self.mark, captured_at)
+
+    def write_file(self, mark, names):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(f"#mark {mark:.3f}\n")
+            f.writelines(f"{name}\t{captured_at if captured_at is not None else ''}\n" for name, captured_at in names)
+        os.replace(tmp_path, self.index_path)
+
+    def is_processed(self, name, captured_at):
+        with self.lock:
+            return captured_at <= self.mark or name in self.names
+
+    def add(self, name, captured_at):
+        if not self.index_path:
+            return
+        with self.lock:
+            if name in self.names:
+                return
+            self.insert(name, captured_at)
+            if len(self.names) > self.max_entries:
+                self.evict_oldest()
+            self.pending.append((name, captured_at))
+
+    def flush(self):
+        """
+        Append the names added since the last flush. Append-only between compactions; the file is rewritten
+        once max_entries names have been appended. Reloading replays the evictions, so the mark needs no line
+        of its own until then.
+        """
+        with self.lock:
+            if not self.pending:
+                return
+            pending, self.pending = self.pending, []
+            self.appended += len(pending)
+            snapshot = None
+            if self.appended > self.max_entries:
+                snapshot = (self.mark, list(self.names.items()))
+                self.appended = 0
+        try:
+            if snapshot is not None:
+                self.write_file(*snapshot)
+            else:
+                with open(self.index_path, "a", encoding="utf-8") as f:
+                    f.writelines(f"{name}\t{captured_at}\n" for name, captured_at in pending)
+        except OSError:
+            logger.exception(f"Failed to update processed index: {self.index_path}")
+
+    def run(self):
+        while not self.stop_event.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def close(self, timeout=5.0):
+        """Write what is pending and stop the writer."""
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join(timeout)
+
+
+class BacklogScanner:
+    """
+    Single os.scandir pass that enqueues images left in the watch folder while the app was down:
+    those captured after the processed index's mark and not listed in it.
+    """
+
+    def __init__(self, folder, image_queue, processed_index, claim=None, release=None, metrics=None, line_name=None):
+        self.folder = folder
+        self.image_queue = image_queue
+        self.processed_index = processed_index
+        self.claim = claim
+        self.release = release
+        self.metrics = metrics
+        self.line_name = line_name
+
+    def scan(self):
+        entries = []
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                if not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                key = capture_sort_key(entry)
+                if self.processed_index.is_processed(entry.name, key[0]):
+                    continue
+                entries.append((key, entry.path))
+
+        entries.sort()
+        return [path for _, path in entries]
+
+    def enqueue_backlog(self):
+        try:
+            backlog = self.scan()
+        except OSError:
+            logger.exception(f"Failed to scan backlog in {self.folder}")
+            return 0
+
+        if backlog:
+            logger.info(f"Found {len(backlog)} unprocessed images in {self.folder}, queueing in capture order.")
+
+        queued = 0
+        for path in backlog:
+            if self.claim is not None and not self.claim(path):
+                continue
+            if self.metrics is not None:
+                self.metrics.mark(path, "queued")
+            if not self.image_queue.put(path):
+                logger.warning("Pipeline stopped while queueing the backlog.")
+                if self.release is not None:
+                    self.release(path, processed=False)
+                if self.metrics is not None:
+                    self.metrics.drop(self.line_name, path, "pipeline_stopped")
+                break
+            queued += 1
+
+        logger.info(f"Backlog scan queued {queued} images.")
+        return queued
@@ -0,0 +1,200 @@
+"""
+Decode and annotation in worker processes, with frames passed through shared memory.
+
+The parent owns one SharedMemory block split into fixed-size slots. A slot is taken before a decode is
+submitted and given back once the image is annotated, so at most `slots` images are in flight and
+decode blocks (backpressure) when they are all in use. Workers write decoded pixels straight into the
+slot (the full-resolution frame the model classifies, then the display frame in "display" mode) and only
+small metadata crosses the process boundary; nothing is pickled per frame.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import multiprocessing
+from queue import Queue, Empty
+import os
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from image_io import decode_frame, fit_display_frame, draw_status_border, save_frame
+from result_cache import content_hash
+from logger_config import get_logger
+logger = get_logger()
+
+
+# Worker-process state, set once per process by init_worker.
+_worker_shm = None
+_worker_slot_bytes = 0
+
+
+def init_worker(shm_name, slot_bytes):
+    global _worker_shm, _worker_slot_bytes
+    # Pool workers share the parent's resource tracker, so attaching here does not make the block
+    # go away with the worker; the parent unlinks it in FrameWorkerPool.shutdown.
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_slot_bytes = slot_bytes
+
+
+def slot_view(buffer, slot, slot_bytes, shape, offset=0):
+    return np.ndarray(shape, dtype=np.uint8, buffer=buffer, offset=slot * slot_bytes + offset)
+
+
+def frame_bytes(shape):
+    return int(np.prod(shape)) if shape is not None else 0
+
+
+def decode_task(image_path, slot, max_size):
+    """
+    Runs in a worker: decode into the slot and return (shape, display shape, scale, content hash, frames),
+    frames being (frame, display frame) when they did not fit in the slot and None otherwise.
+    """
+    buffer = np.fromfile(image_path, dtype=np.uint8)
+    digest = content_hash(buffer)
+    frame = decode_frame(image_path, buffer)
+    display, scale = fit_display_frame(frame, max_size) if max_size is not None else (None, 1.0)
+    display_shape = display.shape if display is not None else None
+
+    if frame.nbytes + frame_bytes(display_shape) > _worker_slot_bytes:
+        return frame.shape, display_shape, scale, digest, (frame, display)
+    slot_view(_worker_shm.buf, slot, _worker_slot_bytes, frame.shape)[...] = frame
+    if display is not None:
+        slot_view(_worker_shm.buf, slot, _worker_slot_bytes, display_shape, frame.nbytes)[...] = display
+    return frame.shape, display_shape, scale, digest, None
+
+
+def annotate_task(slot, shape, display_shape, piece_status, scale, render, save_path):
+    """
+    Runs in a worker: optionally save the full-resolution annotated image, then draw the status border
+    on the display frame (the full frame in "full" mode) and convert it to RGB in place for the parent.
+    """
+    frame = slot_view(_worker_shm.buf, slot, _worker_slot_bytes, shape)
+    display = frame
+    if display_shape is not None:
+        display = slot_view(_worker_shm.buf, slot, _worker_slot_bytes, display_shape, frame_bytes(shape))
+
+    if save_path is not None:
+        # The frame is not needed after this, so the border goes straight onto it.
+        draw_status_border(frame, piece_status)
+        os.makedirs(os.path.dirname(save_path) or ".", exist_ok=True)
+        save_frame(frame, save_path)
+
+    if render:
+        draw_status_border(display, piece_status, scale)
+        cv2.cvtColor(display, cv2.COLOR_BGR2RGB, dst=display)
+
+
+class SharedFrameRing:
+    """Fixed-size frame slots in one shared memory block, recycled through a free list."""
+
+    def __init__(self, slots, slot_bytes):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        self.free_slots = Queue()
+        for slot in range(slots):
+            self.free_slots.put(slot)
+
+    def acquire(self, is_running, poll_interval=0.2):
+        """Wait for a free slot; None if is_running() turns false first."""
+        while is_running():
+            try:
+                return self.free_slots.get(timeout=poll_interval)
+            except Empty:
+                continue
+        return None
+
+    def release(self, slot):
+        self.free_slots.put(slot)
+
+    def view(self, slot, shape, offset=0):
+        return slot_view(self.shm.buf, slot, self.slot_bytes, shape, offset)
+
+    def in_use(self):
+        return self.slots - self.free_slots.qsize()
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+class FrameWorkerPool:
+    """
+    Process pool for decode and annotation. Callers block on the result from pipeline threads,
+    which release the GIL while they wait, so the inference thread and the Tk loop keep running.
+    """
+
+    def __init__(self, processes, slots, slot_bytes, shutdown_event):
+        self.shutdown_event = shutdown_event
+        self.ring = SharedFrameRing(slots, slot_bytes)
+        # Spawned, not forked: forking a process that already runs pipeline and watchdog threads can copy
+        # a lock one of them holds (logging, queues) into the worker, which then deadlocks on it.
+        self.executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"),
+                                            initializer=init_worker, initargs=(self.ring.shm.name, slot_bytes))
+
+    def is_running(self):
+        return not self.shutdown_event.is_set()
+
+    def decode(self, image_path, max_size=None, is_running=None):
+        """
+        Returns (frame, display frame, scale, content hash, slot); the frames are views into the slot until
+        release(slot). The display frame is None unless max_size is given.
+        Returns None, without decoding, if the pool or the caller's is_running() stops while waiting for a slot.
+        """
+        slot = self.ring.acquire(lambda: self.is_running() and (is_running is None or is_running()))
+        if slot is None:
+            return None
+
+        try:
+            shape, display_shape, scale, digest, frames = \
+                self.executor.submit(decode_task, image_path, slot, max_size).result()
+        except BaseException:
+            self.ring.release(slot)
+            raise
+
+        if frames is not None:
+            # Larger than a slot (frames bigger than frame_slot_mb): they came back pickled.
+            self.ring.release(slot)
+            return frames[0], frames[1], scale, digest, None
+        frame = self.ring.view(slot, shape)
+        display = self.ring.view(slot, display_shape, frame.nbytes) if display_shape is not None else None
+        return frame, display, scale, digest, slot
+
+    def annotate(self, slot, frame, display_frame, piece_status, scale, render, save_path=None):
+        """
+        Annotate the slot's frames in a worker. Returns the display image when render is set, copied out
+        of the slot so it stays valid after release(slot).
+        """
+        display_shape = display_frame.shape if display_frame is not None else None
+        self.executor.submit(annotate_task, slot, frame.shape, display_shape, piece_status, scale, render,
+                             save_path).result()
+        if render:
+            return Image.fromarray(np.array(display_frame if display_frame is not None else frame))
+        return None
+
+    def release(self, slot):
+        if slot is not None:
+            self.ring.release(slot)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.ring.close()
+
+
+def create_frame_worker_pool(config, shutdown_event):
+    """The pool configured by frame_worker_processes, or None (the default) for the threaded path."""
+    processes = int(config.get("frame_worker_processes", 0))
+    if processes <= 0:
+        return None
+
+    # The full-resolution frame always goes to the model; "display" mode adds the display frame after it.
+    slot_bytes = int(config.get("frame_slot_mb", 32) * 1024 * 1024)
+    if config.get("annotation_mode", "full") == "display":
+        max_width, max_height = config.get("display_max_size", (960, 640))
+        slot_bytes += max_width * max_height * 3
+    slots = int(config.get("frame_ring_slots", 32))
+    pool = FrameWorkerPool(processes, slots, slot_bytes, shutdown_event)
+    logger.info(f"Decode/annotation offloaded to {processes} worker processes "
+                f"({slots} shared-memory slots of {slot_bytes / 1e6:.1f} MB).")
+    return pool
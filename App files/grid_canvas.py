@@ -0,0 +1,62 @@
+import tkinter as tk
+
+
+STATUS_COLORS = {
+    "ok": "#4CAF50",
+    "nok": "#FF6666",
+    "undetected": "gray",
+}
+
+
+class GridCanvas(tk.Canvas):
+    """Result grid drawn on one canvas with a rectangle and a text item per cell, updated cell by cell."""
+
+    def __init__(self, master, rows, columns, padding=2, min_text_height=28, **kwargs):
+        kwargs.setdefault("highlightthickness", 0)
+        super().__init__(master, **kwargs)
+        self.rows = rows
+        self.columns = columns
+        self.padding = padding
+        self.min_text_height = min_text_height
+
+        self.cell_items = {}
+        self.cell_status = {}
+        for row in range(rows):
+            for col in range(columns):
+                rect = self.create_rectangle(0, 0, 0, 0, fill=STATUS_COLORS["undetected"], outline="")
+                text = self.create_text(0, 0, text=f"undetected\n({row},{col})", fill="white",
+                                        justify="center", tags=("cell_text",))
+                self.cell_items[(row, col)] = (rect, text)
+                self.cell_status[(row, col)] = "undetected"
+
+        self.bind("<Configure>", lambda event: self.layout(event.width, event.height))
+
+    def layout(self, width, height):
+        cell_width = width / self.columns
+        cell_height = height / self.rows
+        pad = self.padding
+
+        for (row, col), (rect, text) in self.cell_items.items():
+            x0 = col * cell_width
+            y0 = row * cell_height
+            self.coords(rect, x0 + pad, y0 + pad, x0 + cell_width - pad, y0 + cell_height - pad)
+            self.coords(text, x0 + cell_width / 2, y0 + cell_height / 2)
+
+        # Labels stop being readable on large pallets; the colours alone still carry the status.
+        if cell_height < self.min_text_height:
+            self.itemconfigure("cell_text", state="hidden")
+        else:
+            font_size = max(7, int(min(cell_width / 9, cell_height / 4)))
+            self.itemconfigure("cell_text", state="normal", font=("Arial", font_size, "bold"))
+
+    def update_cells(self, cells):
+        for position, status in cells.items():
+            items = self.cell_items.get(position)
+            if items is None or self.cell_status.get(position) == status:
+                continue
+
+            rect, text = items
+            row, col = position
+            self.itemconfigure(rect, fill=STATUS_COLORS.get(status, "gray"))
+            self.itemconfigure(text, text=f"{status}\n({row},{col})")
+            self.cell_status[position] = status
@@ -0,0 +1,190 @@
+"""
+Headless inspection service: runs the folder watcher, inference and pallet grid logic of
+ProcessingManager without Tk and writes results as JSON lines.
+
+    python headless_service.py --config config.json [--output results.jsonl] [--model best.pt] [--watch folder]
+
+Every line is one JSON object with an "event" field:
+- "image":  one per processed image (status, class, confidence, pallet position).
+- "pallet": one per completed pallet with its ok/nok counts and cells; a partial pallet is flushed on shutdown.
+- "model":  model state changes (loading, warming up, ready, failed).
+With a "lines" list in the config, every line is served from one shared inference executor and
+each record carries the name of its "line".
+Logs go to stderr, so stdout carries nothing but results.
+Relative paths inside the config (watch folders, result store, processed index, models, logs) are
+relative to the config file's folder, wherever the service is started from; paths given on the command
+line are relative to the current directory.
+"""
+
+import sys
+
+# The JSON lines own the real stdout; loguru and any library printing get stderr instead.
+# This has to happen before logger_config binds its sink.
+RESULTS_STREAM = sys.stdout
+sys.stdout = sys.stderr
+
+import argparse
+import json
+import os
+import signal
+import threading
+from datetime import datetime
+
+from logger_config import get_logger, configure_logging
+logger = get_logger()
+
+
+class JsonLinesWriter:
+    """Writes one JSON object per line and flushes it, so readers tailing the output see every result at once."""
+
+    def __init__(self, output_path=None):
+        self.lock = threading.Lock()
+        self.owns_stream = output_path is not None
+        self.stream = open(output_path, "a", encoding="utf-8") if output_path else RESULTS_STREAM
+
+    def write(self, record):
+        line = json.dumps(record, separators=(",", ":"))
+        with self.lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def close(self):
+        if self.owns_stream:
+            self.stream.close()
+
+
+class LineOutput:
+    """Turns one line's grid messages and result records into JSON lines, tracking its pallet."""
+
+    def __init__(self, name, writer):
+        self.name = name
+        self.writer = writer
+        self.current_cell = None
+        self.pallet_complete = False
+        self.pallet_cells = []
+        self.pallet_number = 0
+
+    @staticmethod
+    def timestamp():
+        return datetime.now().isoformat(timespec="milliseconds")
+
+    def on_grid_update(self, message):
+        status = message.get("status")
+        if status == "start_new_palette":
+            self.flush_pallet(complete=False)
+        elif status == "update_cell":
+            # update_cell is sent from the publish stage just before the image's result record.
+            self.current_cell = (message["position"], message["count"])
+            self.pallet_cells.append((message["position"], message["piece_status"]))
+        elif status == "palette_complete":
+            # Written after the last image's own record, see on_result.
+            self.pallet_complete = True
+
+    def flush_pallet(self, complete):
+        if not self.pallet_cells:
+            return
+        self.pallet_number += 1
+        statuses = [status for _, status in self.pallet_cells]
+        self.writer.write({
+            "event": "pallet",
+            "time": self.timestamp(),
+            "line": self.name,
+            "pallet": self.pallet_number,
+            "complete": complete,
+            "count": len(statuses),
+            "ok": statuses.count("ok"),
+            "nok": statuses.count("nok"),
+            "cells": [[row, col, status] for (row, col), status in self.pallet_cells],
+        })
+        self.pallet_cells = []
+
+    def on_result(self, record):
+        position, count = self.current_cell if self.current_cell is not None else (None, None)
+        self.current_cell = None
+        self.writer.write({
+            "event": "image",
+            "time": self.timestamp(),
+            "line": self.name,
+            **record,
+            "position": list(position) if position is not None else None,
+            "pallet_count": count,
+        })
+        if self.pallet_complete:
+            self.pallet_complete = False
+            self.flush_pallet(complete=True)
+
+    def on_model_state(self, state):
+        self.writer.write({"event": "model", "time": self.timestamp(), "line": self.name, "state": state})
+
+    def callbacks(self):
+        return {
+            "update_grid_callback": self.on_grid_update,
+            "result_callback": self.on_result,
+            "model_state_callback": self.on_model_state,
+        }
+
+
+class HeadlessService:
+    def __init__(self, config_path, output_path=None, model_path=None, watch_path=None):
+        with open(config_path, "r") as config_file:
+            config = json.load(config_file)
+        configure_logging(config)
+
+        self.config_path = config_path
+        self.model_path = model_path or config.get("initial_model_path")
+        self.watch_path = watch_path
+        self.writer = JsonLinesWriter(output_path)
+        self.shutdown_event = threading.Event()
+        self.outputs = {}
+        self.lines = None
+
+    def line_callbacks(self, name):
+        self.outputs[name] = LineOutput(name, self.writer)
+        return self.outputs[name].callbacks()
+
+    def request_shutdown(self, *args):
+        logger.info("Shutdown requested.")
+        self.shutdown_event.set()
+
+    def run(self):
+        from production_lines import ProductionLines
+
+        self.lines = ProductionLines(self.config_path, self.model_path, self.shutdown_event, self.line_callbacks,
+                                     watch_folder_path=self.watch_path)
+
+        monitor = threading.Thread(target=self.lines.start_monitoring, daemon=True)
+        monitor.start()
+        try:
+            # Blocks until shutdown; without display callbacks annotation is reduced to the status.
+            self.lines.run()
+        finally:
+            self.lines.stop_monitoring()
+            for output in self.outputs.values():
+                output.flush_pallet(complete=False)
+            self.writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the inspection pipeline without a UI, writing JSON lines.")
+    parser.add_argument("--config", default="config.json", help="path to config.json")
+    parser.add_argument("--output", default=None, help="JSON lines file to append to (default: stdout)")
+    parser.add_argument("--model", default=None, help="model path (default: initial_model_path from the config)")
+    parser.add_argument("--watch", default=None, help="folder to watch, single-line configs only "
+                                                      "(default: watch_single_folder_path)")
+    args = parser.parse_args(argv)
+
+    # Resolve the command-line paths first, then run from the config's folder, so the config's own
+    # relative paths mean the same as when the UI runs next to it.
+    config_path = os.path.abspath(args.config)
+    output_path, model_path, watch_path = (os.path.abspath(path) if path else None
+                                           for path in (args.output, args.model, args.watch))
+    os.chdir(os.path.dirname(config_path))
+
+    service = HeadlessService(config_path, output_path, model_path, watch_path)
+    signal.signal(signal.SIGINT, service.request_shutdown)
+    signal.signal(signal.SIGTERM, service.request_shutdown)
+    service.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import os
+import cv2
+import numpy as np
+from PIL import Image, ImageFile
+ImageFile.LOAD_TRUNCATED_IMAGES = True
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.png', '.jpeg')
+
+def decode_frame(image_path, buffer=None):
+    """
+    Decode an image file into a contiguous BGR uint8 array (the layout ultralytics expects).
+    Both cv2.imdecode and PIL release the GIL while decoding, so this scales across threads.
+    Pass the file's bytes as buffer if they were already read.
+    """
+    if buffer is None:
+        buffer = np.fromfile(image_path, dtype=np.uint8)
+    frame = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+    if frame is None:
+        # OpenCV refuses truncated files; PIL can still recover them.
+        with Image.open(image_path) as image:
+            frame = cv2.cvtColor(np.asarray(image.convert("RGB")), cv2.COLOR_RGB2BGR)
+
+    return np.ascontiguousarray(frame)
+
+
+def frame_to_image(frame):
+    return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+
+def fit_display_frame(frame, max_size):
+    """
+    Shrink a decoded frame to fit max_size=(width, height) for display and annotation; returns (frame, scale),
+    scale being display width / original width. The original frame is left untouched for the model.
+    """
+    max_width, max_height = max_size
+    fit = min(max_width / frame.shape[1], max_height / frame.shape[0])
+    if fit >= 1.0:
+        return frame.copy(), 1.0
+    display = cv2.resize(frame, (max(1, int(frame.shape[1] * fit)), max(1, int(frame.shape[0] * fit))),
+                         interpolation=cv2.INTER_LINEAR)
+    return display, display.shape[1] / frame.shape[1]
+
+
+def draw_status_border(frame, piece_status, scale=1.0):
+    label_color = (0, 255, 0) if piece_status == "ok" else (0, 0, 255)
+    # 40 px at full resolution; keep the same visual weight on downscaled frames.
+    thickness = max(1, int(round(40 * scale)))
+
+    h, w, _ = frame.shape
+    cv2.rectangle(frame, (0, 0), (w - 1, h - 1), label_color, thickness)
+
+
+def save_frame(frame, output_path):
+    extension = os.path.splitext(output_path)[1] or ".jpg"
+    ok, encoded = cv2.imencode(extension, frame)
+    if not ok:
+        raise OSError(f"Could not encode image: {output_path}")
+    encoded.tofile(output_path)
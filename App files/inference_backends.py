@@ -0,0 +1,324 @@
+import ast
+import hashlib
+import json
+import os
+import shutil
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from logger_config import get_logger
+logger = get_logger()
+
+
+DEFAULT_IMGSZ = 224
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def model_imgsz(yolo_model):
+    """Training image size recorded in an ultralytics checkpoint."""
+    imgsz = getattr(yolo_model.model, "args", {}).get("imgsz", DEFAULT_IMGSZ)
+    return imgsz[0] if isinstance(imgsz, (list, tuple)) else int(imgsz)
+
+
+def classify_preprocess(frames, imgsz):
+    """
+    Mirror ultralytics' classify transforms (resize shortest side, centre crop, scale to 0-1)
+    on BGR frames and return a contiguous float32 NCHW batch.
+    """
+    batch = np.empty((len(frames), 3, imgsz, imgsz), dtype=np.float32)
+    for index, frame in enumerate(frames):
+        height, width = frame.shape[:2]
+        if width <= height:
+            new_width, new_height = imgsz, int(imgsz * height / width)
+        else:
+            new_width, new_height = int(imgsz * width / height), imgsz
+
+        # PIL bilinear (antialiased) is what torchvision's Resize uses on PIL images.
+        rgb = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        resized = np.asarray(rgb.resize((new_width, new_height), Image.BILINEAR))
+
+        top = int(round((new_height - imgsz) / 2.0))
+        left = int(round((new_width - imgsz) / 2.0))
+        crop = resized[top:top + imgsz, left:left + imgsz]
+        batch[index] = crop.transpose(2, 0, 1) / 255.0
+    return batch
+
+
+class UltralyticsBackend:
+    """The original path: a full ultralytics YOLO model and its predictor."""
+
+    name = "ultralytics"
+
+    def __init__(self, model_path, prediction_parameters):
+        from ultralytics import YOLO
+
+        self.model_path = model_path
+        self.prediction_parameters = prediction_parameters
+        self.model = YOLO(model_path)
+        self.names = self.model.names
+        self.imgsz = model_imgsz(self.model)
+
+    def warmup(self):
+        self.classify([np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)])
+
+    def classify(self, frames):
+        results = self.model.predict(
+                source=frames,
+                iou=self.prediction_parameters.get("iou", 0.5),
+                conf=self.prediction_parameters.get("conf", 0.6),
+                classes=self.prediction_parameters.get("classes"),
+                save=False,
+                verbose=False  # otherwise ultralytics prints a result line and a "Speed:" line per batch
+            )
+
+        outputs = []
+        for result in results:
+            if hasattr(result, "probs") and result.probs is not None:
+                outputs.append(result.probs.data.cpu().numpy())
+            else:
+                outputs.append(None)
+        return outputs
+
+
+class OpenCVDnnBackend:
+    """Runs an ONNX export of the classifier with cv2.dnn, so torch is not needed at inference time."""
+
+    name = "opencv_dnn"
+
+    def __init__(self, model_path, prediction_parameters):
+        self.model_path = model_path
+        self.prediction_parameters = prediction_parameters
+
+        if model_path.lower().endswith(".onnx"):
+            self.onnx_path = model_path
+            metadata = self.read_onnx_metadata(model_path)
+        else:
+            self.onnx_path, metadata = self.export_onnx(model_path)
+
+        self.metadata = metadata
+        self.names = metadata["names"]
+        self.imgsz = metadata["imgsz"]
+        self.net = cv2.dnn.readNetFromONNX(self.onnx_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        logger.info(f"OpenCV DNN backend ready: {self.onnx_path} (imgsz {self.imgsz})")
+
+    @staticmethod
+    def export_onnx(model_path):
+        """Export once and cache next to the model as <stem>.<hash>.onnx with a JSON sidecar."""
+        model_hash = file_hash(model_path)[:12]
+        stem = os.path.splitext(model_path)[0]
+        onnx_path = f"{stem}.{model_hash}.onnx"
+        sidecar_path = f"{stem}.{model_hash}.json"
+
+        if os.path.exists(onnx_path) and os.path.exists(sidecar_path):
+            with open(sidecar_path, "r") as f:
+                return onnx_path, OpenCVDnnBackend.normalise_metadata(json.load(f))
+
+        from ultralytics import YOLO
+
+        logger.info(f"Exporting {model_path} to ONNX (cached as {onnx_path})...")
+        model = YOLO(model_path)
+        imgsz = model_imgsz(model)
+        exported_path = model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+        shutil.move(exported_path, onnx_path)
+
+        metadata = {"names": {int(k): v for k, v in model.names.items()}, "imgsz": imgsz, "source": model_path}
+        with open(sidecar_path, "w") as f:
+            json.dump(metadata, f, indent=4)
+        return onnx_path, OpenCVDnnBackend.normalise_metadata(metadata)
+
+    @staticmethod
+    def read_onnx_metadata(onnx_path):
+        sidecar_path = f"{os.path.splitext(onnx_path)[0]}.json"
+        if os.path.exists(sidecar_path):
+            with open(sidecar_path, "r") as f:
+                return OpenCVDnnBackend.normalise_metadata(json.load(f))
+
+        # ultralytics stores names/imgsz in the ONNX metadata_props; reading them needs the onnx package.
+        try:
+            import onnx
+            props = {p.key: p.value for p in onnx.load(onnx_path, load_external_data=False).metadata_props}
+            imgsz = ast.literal_eval(props.get("imgsz", str(DEFAULT_IMGSZ)))
+            return OpenCVDnnBackend.normalise_metadata({
+                "names": ast.literal_eval(props["names"]),
+                "imgsz": imgsz[0] if isinstance(imgsz, (list, tuple)) else imgsz,
+            })
+        except (ImportError, KeyError, ValueError, SyntaxError):
+            raise ValueError(f"No class names found for {onnx_path}; add a {sidecar_path} sidecar.")
+
+    @staticmethod
+    def normalise_metadata(metadata):
+        metadata["names"] = {int(k): v for k, v in metadata["names"].items()}
+        metadata["imgsz"] = int(metadata["imgsz"])
+        return metadata
+
+    def warmup(self):
+        self.classify([np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)])
+
+    def classify(self, frames):
+        self.net.setInput(classify_preprocess(frames, self.imgsz))
+        probs = self.net.forward()
+        return [row for row in probs.reshape(len(frames), -1)]
+
+
+class OnnxRuntimeBackend:
+    """
+    Runs an ONNX graph with onnxruntime (optional dependency). This is the backend for INT8 artifacts
+    from Scripts/quantize_model.py, whose QDQ graphs cv2.dnn does not run reliably.
+    """
+
+    name = "onnxruntime"
+
+    def __init__(self, model_path, prediction_parameters):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ValueError("The onnxruntime backend needs the onnxruntime package (pip install onnxruntime).")
+
+        self.model_path = model_path
+        self.prediction_parameters = prediction_parameters
+
+        if model_path.lower().endswith(".onnx"):
+            self.onnx_path = model_path
+            metadata = OpenCVDnnBackend.read_onnx_metadata(model_path)
+        else:
+            self.onnx_path, metadata = OpenCVDnnBackend.export_onnx(model_path)
+
+        self.metadata = metadata
+        self.names = metadata["names"]
+        self.imgsz = metadata["imgsz"]
+        self.session = onnxruntime.InferenceSession(self.onnx_path, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        logger.info(f"onnxruntime backend ready: {self.onnx_path} (imgsz {self.imgsz})")
+
+    def warmup(self):
+        self.classify([np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)])
+
+    def classify(self, frames):
+        probs = self.session.run(None, {self.input_name: classify_preprocess(frames, self.imgsz)})[0]
+        return [row for row in probs.reshape(len(frames), -1)]
+
+
+class TorchClassifyBackend:
+    """
+    Lean classify path: the checkpoint's nn.Module called directly under torch.inference_mode,
+    with batched torch preprocessing and no predictor, Results objects or per-image printing.
+    """
+
+    name = "torch"
+
+    def __init__(self, model_path, prediction_parameters):
+        import torch
+        from ultralytics import YOLO
+
+        yolo = YOLO(model_path)
+        if yolo.task != "classify":
+            raise ValueError(f"The torch backend only runs classification models, got task '{yolo.task}'.")
+
+        self.torch = torch
+        self.model_path = model_path
+        self.names = yolo.names
+        self.imgsz = model_imgsz(yolo)
+        # Same conv+bn fusion the ultralytics predictor applies to .pt models.
+        self.module = yolo.model.float().fuse(verbose=False).eval()
+
+    def warmup(self):
+        self.classify([np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)])
+
+    def preprocess(self, frames):
+        """Shortest-side antialiased bilinear resize + centre crop, matching the PIL-based classify transforms."""
+        torch = self.torch
+        imgsz = self.imgsz
+        crops = []
+        for frame in frames:
+            height, width = frame.shape[:2]
+            if width <= height:
+                new_width, new_height = imgsz, int(imgsz * height / width)
+            else:
+                new_width, new_height = int(imgsz * width / height), imgsz
+
+            # uint8 HWC viewed as NCHW is channels-last, which hits torch's vectorised uint8 resize kernel.
+            tensor = torch.from_numpy(frame).permute(2, 0, 1).unsqueeze(0)
+            if (new_height, new_width) != (height, width):
+                tensor = torch.nn.functional.interpolate(tensor, size=(new_height, new_width), mode="bilinear",
+                                                         align_corners=False, antialias=True)
+
+            top = int(round((new_height - imgsz) / 2.0))
+            left = int(round((new_width - imgsz) / 2.0))
+            crops.append(tensor[:, :, top:top + imgsz, left:left + imgsz])
+
+        # BGR -> RGB and scale to 0-1 in one pass over the cropped batch.
+        return torch.cat(crops)[:, [2, 1, 0]].float().div_(255.0).contiguous()
+
+    def classify(self, frames):
+        torch = self.torch
+        with torch.inference_mode():
+            output = self.module(self.preprocess(frames))
+        if isinstance(output, (list, tuple)):
+            output = output[0]
+        return list(output.cpu().numpy())
+
+
+INFERENCE_BACKENDS = {
+    UltralyticsBackend.name: UltralyticsBackend,
+    OpenCVDnnBackend.name: OpenCVDnnBackend,
+    OnnxRuntimeBackend.name: OnnxRuntimeBackend,
+    TorchClassifyBackend.name: TorchClassifyBackend,
+}
+
+
+def build_status_table(names, status_logic):
+    """Map every class id to its status once, using the same keyword rules as status_logic."""
+    table = {}
+    for class_id, class_name in names.items():
+        table[class_id] = None
+        for status, keywords in status_logic.items():
+            if any(keyword in class_name.lower() for keyword in keywords):
+                table[class_id] = status
+                break
+    return table
+
+
+def check_quantized_model(model_path, metadata, min_agreement):
+    """
+    Refuse a quantized artifact unless its sidecar reports top-1 agreement with the float model
+    of at least min_agreement. Float models pass through untouched.
+    """
+    report = (metadata or {}).get("quantization")
+    if report is None:
+        if ".int8." in os.path.basename(model_path):
+            raise ValueError(f"{model_path} looks quantized but has no quantization report; "
+                             f"rebuild it with Scripts/quantize_model.py.")
+        return
+
+    agreement = report.get("top1_agreement", 0.0)
+    if agreement < min_agreement:
+        raise ValueError(f"Refusing quantized model {model_path}: top-1 agreement with the float model is "
+                         f"{agreement:.2%}, below the configured minimum of {min_agreement:.2%}.")
+    logger.info(f"Quantized model {model_path} accepted: top-1 agreement {agreement:.2%} "
+                f"on {report.get('holdout_images', '?')} held-out images.")
+
+
+def create_inference_backend(model_path, prediction_parameters, backend_name=None, min_quantized_agreement=None):
+    backend_name = backend_name or UltralyticsBackend.name
+    if backend_name not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend_name}'. Available: {list(INFERENCE_BACKENDS)}")
+    if backend_name == TorchClassifyBackend.name and model_path.lower().endswith(".onnx"):
+        # The torch path needs the .pt module; exported and quantized graphs go through onnxruntime.
+        backend_name = OnnxRuntimeBackend.name
+
+    logger.info(f"Loading {model_path} with the '{backend_name}' backend...")
+    backend = INFERENCE_BACKENDS[backend_name](model_path, prediction_parameters)
+    if min_quantized_agreement is not None:
+        check_quantized_model(model_path, getattr(backend, "metadata", None), min_quantized_agreement)
+    return backend
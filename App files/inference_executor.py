@@ -0,0 +1,249 @@
+from collections import Counter, deque
+import os
+import threading
+import time
+
+from result_cache import ResultCache
+from startup_timer import get_startup_timer
+from logger_config import get_logger, get_image_logger
+logger = get_logger()
+image_logger = get_image_logger()
+startup_timer = get_startup_timer()
+
+
+class InferenceLine:
+    """
+    One production line's slot in a shared InferenceExecutor. It sits in the line's Pipeline where
+    the inference stage used to be: decode puts images in, and the executor forwards them to the next stage.
+    """
+
+    def __init__(self, executor, line_name, model_provider, maxsize=0, on_drop=None):
+        self.executor = executor
+        self.name = "inference"  # the stage name, as reported by Pipeline.queue_depths
+        self.line_name = line_name
+        self.model_provider = model_provider
+        self.maxsize = maxsize
+        self.on_drop = on_drop  # as PipelineStage.on_drop: a job the next stage refused while stopping
+        self.items = deque()
+        self.next_stage = None
+        self.keep_running = True
+        self.processed_count = 0
+
+    def connect(self, next_stage):
+        self.next_stage = next_stage
+        return next_stage
+
+    def put(self, item):
+        return self.executor.submit(self, item)
+
+    def depth(self):
+        return len(self.items)
+
+    def start(self):
+        self.keep_running = True
+        return self
+
+    def stop(self):
+        self.keep_running = False
+
+    def join(self, timeout=None):
+        pass
+
+
+class InferenceExecutor:
+    """
+    Single inference thread shared by every line, so each model is loaded and run once per PC.
+    Batches are filled round-robin, one image per line per round, starting from a different line each
+    batch, so a busy camera cannot starve the others. Images from different lines share a batch when
+    the lines currently use the same model; a line whose model is still loading simply waits.
+    """
+
+    def __init__(self, shutdown_event, batch_size=1, batch_max_wait=0.0, result_cache_size=1000,
+                 poll_interval=0.2):
+        self.shutdown_event = shutdown_event
+        self.batch_size = max(1, batch_size)
+        self.batch_max_wait = batch_max_wait
+        self.poll_interval = poll_interval
+
+        self.condition = threading.Condition()
+        self.lines = []
+        self.next_line = 0
+        self.keep_running = True
+        self.thread = None
+
+        self.result_cache = ResultCache(result_cache_size)
+        self.first_inference_done = False
+        self.batch_size_counts = Counter()
+        self.line_image_counts = Counter()
+        self.batch_report_interval = 50
+
+    def add_line(self, line_name, model_provider, maxsize=0, on_drop=None):
+        line = InferenceLine(self, line_name, model_provider, maxsize, on_drop)
+        with self.condition:
+            self.lines.append(line)
+        return line
+
+    def is_running(self):
+        return self.keep_running and not self.shutdown_event.is_set()
+
+    def submit(self, line, item):
+        """Blocking hand-off: waits while the line's slot is full so its decode stage slows down."""
+        with self.condition:
+            while line.maxsize and len(line.items) >= line.maxsize:
+                if not (self.is_running() and line.keep_running):
+                    return False
+                self.condition.wait(self.poll_interval)
+            if not (self.is_running() and line.keep_running):
+                return False
+            line.items.append(item)
+            self.condition.notify_all()
+        return True
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.keep_running = True
+            self.thread = threading.Thread(target=self.run, name="inference-executor", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.keep_running = False
+        with self.condition:
+            self.condition.notify_all()
+
+    def join(self, timeout=None):
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def collect(self, batch, model):
+        """Add images round-robin across lines; must be called with the condition held."""
+        count = len(self.lines)
+        progress = True
+        while progress and len(batch) < self.batch_size:
+            progress = False
+            for offset in range(count):
+                if len(batch) >= self.batch_size:
+                    break
+                line = self.lines[(self.next_line + offset) % count]
+                if not line.items:
+                    continue
+                line_model = line.model_provider()
+                if line_model is None or (model is not None and line_model is not model):
+                    continue
+                model = line_model
+                batch.append((line, line.items.popleft()))
+                progress = True
+
+        if batch:
+            self.condition.notify_all()
+        return model
+
+    def next_batch(self):
+        batch = []
+        with self.condition:
+            model = self.collect(batch, None)
+            if not batch:
+                self.condition.wait(self.poll_interval)
+                model = self.collect(batch, None)
+                if not batch:
+                    return [], None
+
+            deadline = time.monotonic() + self.batch_max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+                model = self.collect(batch, model)
+
+            if self.lines:
+                self.next_line = (self.next_line + 1) % len(self.lines)
+        return batch, model
+
+    def run(self):
+        while self.is_running():
+            batch, model = self.next_batch()
+            if not batch:
+                continue
+
+            try:
+                self.infer([job for _, job in batch], model)
+            except Exception:
+                # Forwarded without probs rather than dropped, so annotate/publish still release the
+                # images' in-flight claims and frame slots (they are recorded as NOK).
+                logger.exception("Unexpected error in the inference executor")
+
+            inferred_at = time.perf_counter()
+            for _, job in batch:
+                job.timestamps["inferred"] = inferred_at
+
+            # A line whose downstream stages are full holds up the executor, like any blocking stage would.
+            for line, job in batch:
+                line.processed_count += 1
+                self.line_image_counts[line.line_name] += 1
+                if line.next_stage is not None and not line.next_stage.put(job) and line.on_drop is not None:
+                    line.on_drop(job)
+
+    def infer(self, jobs, model):
+        """Classify decoded jobs with model in one batch, serving byte-identical images from the result cache."""
+        decoded = [job for job in jobs if job.frame is not None]
+        if not decoded:
+            return jobs
+
+        identity = (model.name, model.model_path, model.fingerprint)
+        pending = []
+        for job in decoded:
+            job.status_table = model.status_table
+            job.class_names = model.names
+            job.model_path = model.model_path
+            cached = self.result_cache.get((job.content_hash, identity)) if job.content_hash else None
+            if cached is not None:
+                image_logger.info("Result cache hit: {}", os.path.basename(job.image_path))
+                job.probs = cached
+            else:
+                pending.append(job)
+
+        if pending:
+            start = time.perf_counter()
+            batch_probs = model.classify([job.frame for job in pending])
+            if not self.first_inference_done:
+                self.first_inference_done = True
+                startup_timer.record("first_inference", (time.perf_counter() - start) * 1000.0)
+                startup_timer.log_summary()
+
+            for job, probs in zip(pending, batch_probs):
+                job.probs = probs
+                if job.content_hash and probs is not None:
+                    self.result_cache.put((job.content_hash, identity), probs)
+
+        self.record_batch_size(len(pending))
+        return jobs
+
+    def record_batch_size(self, size):
+        if size == 0:
+            return
+        self.batch_size_counts[size] += 1
+        batches = sum(self.batch_size_counts.values())
+        if batches % self.batch_report_interval == 0:
+            stats = self.get_batch_stats()
+            logger.info(f"Batch sizes after {stats['batches']} batches: "
+                        f"mean {stats['mean']:.2f} (max {self.batch_size}), histogram {stats['histogram']}")
+            if len(self.lines) > 1:
+                logger.info(f"Images per line: {stats['lines']}")
+            cache_stats = self.result_cache.get_stats()
+            logger.info(f"Result cache: hit rate {cache_stats['hit_rate']:.1%} "
+                        f"({cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['entries']} entries)")
+
+    def get_batch_stats(self):
+        batches = sum(self.batch_size_counts.values())
+        images = sum(size * count for size, count in self.batch_size_counts.items())
+        return {
+            "batches": batches,
+            "images": images,
+            "mean": images / batches if batches else 0.0,
+            "histogram": dict(sorted(self.batch_size_counts.items())),
+            "lines": dict(self.line_image_counts),
+        }
+
+    def queue_depths(self):
+        return {line.line_name: line.depth() for line in self.lines}
@@ -1,14 +1,228 @@
 from loguru import logger
+from collections import Counter
+from queue import Queue, Empty, Full
+import atexit
+import json
+import os
 import sys
+import threading
+import time
+import traceback
+
+CONSOLE_FORMAT = ("<green>{time:YYYY-MM-DD HH:mm:ss}</green> | "
+                  "<level>{level}</level> | "
+                  "<cyan>{message}</cyan>")
+
 logger.remove()
 logger.add(
-    sys.stdout, 
-    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | "
-           "<level>{level}</level> | "
-           "<cyan>{message}</cyan>",
+    sys.stdout,
+    format=CONSOLE_FORMAT,
     level="INFO",
     colorize=True
 )
 
+
+# Records a BackgroundSink dropped because its queue was full, per sink name (exported by metrics.py).
+dropped_log_records = Counter()
+WARNING_LEVEL_NO = 30
+
+
+class BackgroundSink:
+    """
+    Loguru sink that only puts the formatted message on an in-process queue; a daemon thread writes
+    whatever has accumulated and flushes once per batch. (loguru's own enqueue=True pickles every record
+    through a multiprocessing pipe, which costs the caller more than writing to the console directly.)
+    When the queue is full, DEBUG/INFO records are dropped and counted; warnings and errors wait for room.
+    """
+
+    def __init__(self, stream, name="console", max_pending=10000):
+        self.stream = stream
+        self.name = name
+        self.pending = Queue(maxsize=max_pending)
+        self.dropped = 0
+        self.reported = 0
+        self.thread = threading.Thread(target=self.run, name=f"log-writer-{name}", daemon=True)
+        self.thread.start()
+
+    def write(self, message, level_no=WARNING_LEVEL_NO):
+        if level_no >= WARNING_LEVEL_NO:
+            self.pending.put(message)
+            return
+        try:
+            self.pending.put_nowait(message)
+        except Full:
+            # Console stalled (e.g. a selection is held in a Windows console); never block the pipeline for it.
+            self.dropped += 1
+            dropped_log_records[self.name] += 1
+
+    def run(self):
+        while True:
+            lines = [self.pending.get()]
+            while len(lines) < 1000:
+                try:
+                    lines.append(self.pending.get_nowait())
+                except Empty:
+                    break
+            text = "".join(line for line in lines if line is not None)
+            dropped = self.dropped
+            if dropped != self.reported:
+                # Written here rather than logged: a record would queue behind this very thread.
+                text += (f"{time.strftime('%Y-%m-%d %H:%M:%S')} | WARNING | {dropped - self.reported} log records "
+                         f"dropped while the {self.name} output was stalled ({dropped} in total)\n")
+                self.reported = dropped
+            try:
+                if text:
+                    self.stream.write(text)
+                    self.stream.flush()
+            except (OSError, ValueError):
+                pass
+            if None in lines:
+                return
+
+    def stop(self):
+        self.pending.put(None)
+        self.thread.join(timeout=2.0)
+
+
+class RotatingFile:
+    """Append-only text file rotated by size: path -> path.1 -> ... -> path.<backups>, the oldest deleted."""
+
+    def __init__(self, path, max_bytes, backups):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(path, "a", encoding="utf-8")
+        self.size = self.file.tell()
+
+    def write(self, text):
+        if self.size and self.size + len(text) > self.max_bytes:
+            self.rotate()
+        self.file.write(text)
+        self.size += len(text)
+
+    def flush(self):
+        self.file.flush()
+
+    def rotate(self):
+        self.file.close()
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.size = 0
+
+
+def json_line(message):
+    """One compact JSON object per record; loguru's serialize=True dumps the whole record and costs ~10x more."""
+    record = message.record
+    entry = {
+        "time": record["time"].isoformat(timespec="milliseconds"),
+        "level": record["level"].name,
+        "message": record["message"],
+        "module": record["module"],
+        "function": record["function"],
+        "line": record["line"],
+        "thread": record["thread"].name,
+    }
+    if record["extra"]:
+        entry["extra"] = record["extra"]
+    if record["exception"] is not None:
+        entry["exception"] = "".join(traceback.format_exception(*record["exception"]))
+    return json.dumps(entry, default=str) + "\n"
+
+
+class ImageLogger:
+    """
+    The INFO lines logged for every image (event detected, queued, processing, status, displayed...).
+    Each message template is sampled on its own: the first and then every `every`-th call is logged,
+    at most max_per_second per second. The decision is made before loguru builds a record, so a
+    skipped line costs a counter increment. every=0 turns them off; warnings and errors always use logger.
+    """
+
+    def __init__(self, every=1, max_per_second=0):
+        self.every = every
+        self.max_per_second = max_per_second
+        self.counts = Counter()
+        self.windows = {}
+
+    def info(self, message, *args, **kwargs):
+        if self.every <= 0:
+            return
+        # Counter races between threads only shift which call is sampled; no lock on the hot path.
+        count = self.counts[message]
+        self.counts[message] = count + 1
+        if count % self.every:
+            return
+        if self.max_per_second:
+            second = int(time.monotonic())
+            window_second, logged = self.windows.get(message, (second, 0))
+            if window_second != second:
+                window_second, logged = second, 0
+            if logged >= self.max_per_second:
+                return
+            self.windows[message] = (window_second, logged + 1)
+        logger.opt(depth=1).info(message, *args, **kwargs)
+
+
+image_logger = ImageLogger()
+background_sinks = []
+
+
+def stop_background_sinks():
+    while background_sinks:
+        background_sinks.pop().stop()
+
+
+atexit.register(stop_background_sinks)
+
+
+def configure_logging(config, console=None):
+    """
+    Apply the "logging" section of config.json:
+    - "async": the console is written from a background thread (BackgroundSink), so a slow console never blocks the pipeline.
+    - "json_file": also write one JSON object per line there (background thread too), rotated every
+      "json_max_mb" and keeping "json_backups" old files.
+    - "image_log_every" / "image_log_max_per_second": sampling of the per-image INFO lines (see ImageLogger).
+    """
+    settings = config.get("logging", {})
+    level = settings.get("level", "INFO")
+    console = console or sys.stdout
+
+    logger.remove()
+    stop_background_sinks()
+
+    if settings.get("async", True):
+        if os.name == "nt":
+            # What loguru does for stream sinks on Windows: translate the color codes for the console.
+            import colorama
+            console = colorama.AnsiToWin32(console).stream
+        console_sink = BackgroundSink(console, "console")
+        background_sinks.append(console_sink)
+        logger.add(lambda message: console_sink.write(message, message.record["level"].no),
+                   format=CONSOLE_FORMAT, level=level, colorize=True)
+    else:
+        logger.add(console, format=CONSOLE_FORMAT, level=level, colorize=True)
+
+    if settings.get("json_file"):
+        json_file = RotatingFile(settings["json_file"], int(settings.get("json_max_mb", 20) * 1024 * 1024),
+                                 settings.get("json_backups", 10))
+        json_sink = BackgroundSink(json_file, "json")
+        background_sinks.append(json_sink)
+        logger.add(lambda message: json_sink.write(json_line(message), message.record["level"].no),
+                   format="{message}", level=level)
+
+    image_logger.every = settings.get("image_log_every", 1)
+    image_logger.max_per_second = settings.get("image_log_max_per_second", 0)
+
+
 def get_logger():
     return logger
+
+
+def get_image_logger():
+    return image_logger
@@ -0,0 +1,270 @@
+"""
+Per-image stage latencies, queue depths, drops and throughput, served in Prometheus text format.
+
+Each image collects perf_counter timestamps as it moves through the line:
+    event     watcher saw the file
+    ready     the file was complete (end marker found)
+    queued    accepted by the decode stage
+    decoded   frame decoded
+    inferred  classification done
+    displayed result handed to the display/result callbacks (publish stage)
+Timestamps taken before the ImageJob exists (event, ready, queued) are kept here by path and moved onto
+job.timestamps at decode; the rest are written on the job directly. When an image finishes, the gap between
+each pair of consecutive stages is recorded, labelled by the later stage (so "decoded" is the time from
+queued to decoded, decode queue wait included), plus "total" from the first timestamp to displayed.
+Backlog images start at queued.
+"""
+
+from collections import Counter, OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import time
+
+import numpy as np
+
+from logger_config import get_logger, dropped_log_records
+logger = get_logger()
+
+
+STAGES = ("event", "ready", "queued", "decoded", "inferred", "displayed")
+QUANTILES = (0.5, 0.95, 0.99)
+LABEL_ESCAPES = str.maketrans({"\\": "\\\\", '"': '\\"', "\n": "\\n"})
+
+
+class LatencyWindow:
+    """Count and sum since start plus the most recent samples, for quantiles that follow the current load."""
+
+    def __init__(self, window=4096):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def quantiles(self):
+        if not self.samples:
+            return {q: 0.0 for q in QUANTILES}
+        values = np.percentile(np.fromiter(self.samples, dtype=np.float64), [q * 100 for q in QUANTILES])
+        return dict(zip(QUANTILES, values))
+
+
+def format_labels(**labels):
+    """name="value" pairs, escaped as the exposition format requires; line names come from the config."""
+    return ",".join(f'{name}="{str(value).translate(LABEL_ESCAPES)}"' for name, value in labels.items())
+
+
+def create_pipeline_metrics(config):
+    return PipelineMetrics(
+        port=config.get("metrics_port"),
+        host=config.get("metrics_host", "127.0.0.1"),
+        log_interval=config.get("metrics_log_interval_s", 60),
+    )
+
+
+class PipelineMetrics:
+    """
+    Shared by every line (lines are labels). port=None disables the HTTP endpoint and log_interval=0
+    the summary line; the timestamps are collected either way, they cost a dict write per stage.
+    """
+
+    def __init__(self, port=None, host="127.0.0.1", log_interval=60, max_in_flight=10000):
+        self.port = port
+        self.host = host
+        self.log_interval = log_interval
+        self.max_in_flight = max_in_flight
+
+        self.lock = threading.Lock()
+        self.in_flight = OrderedDict()
+        self.latencies = {}
+        self.images = Counter()
+        self.drops = Counter()
+        self.queue_depth_sources = {}
+        self.started_at = time.time()
+        self.last_published = 0
+
+        self.server = None
+        self.summary_thread = None
+        self.stop_event = threading.Event()
+
+    def mark(self, path, stage):
+        with self.lock:
+            timestamps = self.in_flight.get(path)
+            if timestamps is None:
+                timestamps = self.in_flight[path] = {}
+                if len(self.in_flight) > self.max_in_flight:
+                    self.in_flight.popitem(last=False)
+            timestamps[stage] = time.perf_counter()
+
+    def take(self, path):
+        """The timestamps recorded for path so far; they now belong to the ImageJob."""
+        with self.lock:
+            return self.in_flight.pop(path, {})
+
+    def drop(self, line, path, reason):
+        """An image that left the line without a result (or a result without an image)."""
+        with self.lock:
+            self.in_flight.pop(path, None)
+            self.drops[(line, reason)] += 1
+
+    def observe(self, line, timestamps, status):
+        previous = None
+        gaps = []
+        for stage in STAGES:
+            if stage in timestamps:
+                if previous is not None:
+                    gaps.append((stage, (timestamps[stage] - timestamps[previous]) * 1000.0))
+                previous = stage
+        first = next((timestamps[stage] for stage in STAGES if stage in timestamps), None)
+        if first is not None and "displayed" in timestamps:
+            gaps.append(("total", (timestamps["displayed"] - first) * 1000.0))
+
+        with self.lock:
+            self.images[(line, str(status))] += 1
+            for stage, milliseconds in gaps:
+                window = self.latencies.get((line, stage))
+                if window is None:
+                    window = self.latencies[(line, stage)] = LatencyWindow()
+                window.observe(milliseconds)
+
+    def add_queue_depth_source(self, line, source):
+        """source() returns {stage name: depth}, e.g. ProcessingManager.get_queue_depths."""
+        self.queue_depth_sources[line] = source
+
+    def queue_depths(self):
+        depths = {}
+        for line, source in list(self.queue_depth_sources.items()):
+            try:
+                depths[line] = source()
+            except Exception:
+                logger.exception(f"Failed to read queue depths for {line}")
+        return depths
+
+    def snapshot(self):
+        """Plain-dict copy of everything collected so far, for benchmarks and reports."""
+        with self.lock:
+            latencies = {}
+            for (line, stage), window in self.latencies.items():
+                quantiles = window.quantiles()
+                latencies.setdefault(line, {})[stage] = {
+                    "count": window.count,
+                    "mean": window.total / window.count if window.count else 0.0,
+                    "p50": quantiles[0.5], "p95": quantiles[0.95], "p99": quantiles[0.99],
+                }
+            images, drops = Counter(), Counter()
+            for (line, status), count in self.images.items():
+                images[line] += count
+            for (line, reason), count in self.drops.items():
+                drops[f"{line}/{reason}"] += count
+        return {"latency_ms": latencies, "images": dict(images), "drops": dict(drops)}
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self.lock:
+            latencies = {key: (window.quantiles(), window.count, window.total) for key, window in self.latencies.items()}
+            images = dict(self.images)
+            drops = dict(self.drops)
+
+        out = [
+            "# HELP inspection_stage_latency_ms Time from the previous stage to this one, per image.",
+            "# TYPE inspection_stage_latency_ms summary",
+        ]
+        for (line, stage), (quantiles, count, total) in sorted(latencies.items()):
+            labels = format_labels(line=line, stage=stage)
+            for quantile, value in quantiles.items():
+                out.append(f'inspection_stage_latency_ms{{{labels},quantile="{quantile}"}} {value:.3f}')
+            out.append(f"inspection_stage_latency_ms_sum{{{labels}}} {total:.3f}")
+            out.append(f"inspection_stage_latency_ms_count{{{labels}}} {count}")
+
+        out += ["# HELP inspection_images_total Images published, by status.",
+                "# TYPE inspection_images_total counter"]
+        for (line, status), count in sorted(images.items()):
+            out.append(f'inspection_images_total{{{format_labels(line=line, status=status)}}} {count}')
+
+        out += ["# HELP inspection_drops_total Images lost or degraded, by reason.",
+                "# TYPE inspection_drops_total counter"]
+        for (line, reason), count in sorted(drops.items()):
+            out.append(f'inspection_drops_total{{{format_labels(line=line, reason=reason)}}} {count}')
+
+        out += ["# HELP inspection_queue_depth Items waiting in front of each stage.",
+                "# TYPE inspection_queue_depth gauge"]
+        for line, depths in sorted(self.queue_depths().items()):
+            for stage, depth in depths.items():
+                out.append(f'inspection_queue_depth{{{format_labels(line=line, stage=stage)}}} {depth}')
+
+        out += ["# HELP inspection_log_records_dropped_total Log records dropped while a log output was stalled.",
+                "# TYPE inspection_log_records_dropped_total counter"]
+        for sink, count in sorted(dropped_log_records.items()):
+            out.append(f'inspection_log_records_dropped_total{{{format_labels(sink=sink)}}} {count}')
+
+        out += ["# HELP inspection_start_time_seconds Unix time the metrics started.",
+                "# TYPE inspection_start_time_seconds gauge",
+                f"inspection_start_time_seconds {self.started_at:.3f}"]
+        return "\n".join(out) + "\n"
+
+    def summary(self, interval):
+        """One log line: images/s over the last interval, end-to-end percentiles, the slowest stage, queues, drops."""
+        with self.lock:
+            published = sum(self.images.values())
+            totals = [(line, window.quantiles()) for (line, stage), window in self.latencies.items() if stage == "total"]
+            stage_p95 = [(window.quantiles()[0.95], line, stage) for (line, stage), window in self.latencies.items()
+                         if stage != "total"]
+            drops = sum(self.drops.values())
+
+        rate = (published - self.last_published) / interval if interval else 0.0
+        self.last_published = published
+        parts = [f"{rate:.1f} images/s"]
+        for line, quantiles in sorted(totals):
+            parts.append(f"{line} total p50/p95/p99 {quantiles[0.5]:.0f}/{quantiles[0.95]:.0f}/{quantiles[0.99]:.0f} ms")
+        if stage_p95:
+            p95, line, stage = max(stage_p95)
+            parts.append(f"slowest stage {line}/{stage} p95 {p95:.0f} ms")
+        parts.append(f"queues {self.queue_depths()}")
+        parts.append(f"drops {drops}")
+        return ", ".join(parts)
+
+    def run_summary(self):
+        while not self.stop_event.wait(self.log_interval):
+            logger.info(f"Metrics: {self.summary(self.log_interval)}")
+
+    def start(self):
+        if self.port and self.server is None:
+            metrics = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = metrics.render().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            try:
+                self.server = ThreadingHTTPServer((self.host, int(self.port)), Handler)
+                self.server.daemon_threads = True
+                threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+                logger.info(f"Metrics endpoint: http://{self.host}:{self.port}/metrics")
+            except OSError as e:
+                self.server = None
+                logger.error(f"Could not start the metrics endpoint on {self.host}:{self.port}: {e}")
+
+        if self.log_interval and self.summary_thread is None:
+            self.summary_thread = threading.Thread(target=self.run_summary, name="metrics-summary", daemon=True)
+            self.summary_thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -2,10 +2,13 @@ from tkinter import filedialog
 from logger_config import get_logger
 logger = get_logger()
 
+from model_pool import ModelPool
+
 class ModelManager:
-    def __init__(self, initial_model_path=None):
+    def __init__(self, initial_model_path=None, memory_budget_mb=1024):
         self.models_list = []
         self.active_model = None 
+        self.model_pool = ModelPool(memory_budget_mb)
 
         if initial_model_path:
             try:
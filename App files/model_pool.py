@@ -0,0 +1,102 @@
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from threading import Lock
+import os
+import time
+
+from logger_config import get_logger
+logger = get_logger()
+
+
+def model_fingerprint(model_path):
+    """(size, mtime) of a model file; it changes when new weights are copied over the same path."""
+    try:
+        stat = os.stat(model_path)
+    except (OSError, TypeError):
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class ModelPool:
+    """
+    Keeps recently used models loaded and warmed, evicting the least recently used ones
+    once their estimated footprint exceeds memory_budget_mb. The most recent model is never evicted.
+    Loads run outside the lock, so a line loading a new model never holds up the others; a second
+    request for a model that is already loading waits for that load instead of starting its own.
+    """
+
+    def __init__(self, memory_budget_mb=1024, history_size=100):
+        self.memory_budget_mb = memory_budget_mb
+        self.models = OrderedDict()
+        self.loading = {}  # model_path -> Future of the load in progress
+        self.lock = Lock()
+        self.swap_history = deque(maxlen=history_size)
+
+    @staticmethod
+    def estimate_size_mb(model_path):
+        # ultralytics checkpoints store fp16 weights that are loaded as fp32.
+        factor = 2.0 if model_path.lower().endswith(".pt") else 1.0
+        try:
+            return max(1.0, os.path.getsize(model_path) / (1 << 20) * factor)
+        except OSError:
+            return 1.0
+
+    def acquire(self, model_path, loader):
+        """
+        Return (warm model, ms spent loading or waiting for it), loading it with loader(model_path) on a miss.
+        """
+        start = time.perf_counter()
+        with self.lock:
+            if model_path in self.models:
+                model, _, fingerprint = self.models[model_path]
+                if fingerprint == model_fingerprint(model_path):
+                    self.models.move_to_end(model_path)
+                    logger.info(f"Model pool hit: {os.path.basename(model_path)}")
+                    return model, 0.0
+                # Retrained weights were copied over the file since it was loaded.
+                del self.models[model_path]
+                logger.info(f"Model pool entry for {os.path.basename(model_path)} is stale, reloading")
+            loading = self.loading.get(model_path)
+            if loading is None:
+                loading = self.loading[model_path] = Future()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            # Raises the loader's exception if that load failed.
+            model = loading.result()
+            return model, (time.perf_counter() - start) * 1000.0
+
+        fingerprint = model_fingerprint(model_path)
+        try:
+            model = loader(model_path)
+        except BaseException as e:
+            with self.lock:
+                del self.loading[model_path]
+            loading.set_exception(e)
+            raise
+        load_ms = (time.perf_counter() - start) * 1000.0
+
+        with self.lock:
+            del self.loading[model_path]
+            self.models[model_path] = (model, self.estimate_size_mb(model_path), fingerprint)
+            self.evict()
+            loaded, loaded_mb = len(self.models), self.loaded_size_mb()
+        loading.set_result(model)
+        logger.info(f"Model pool loaded {os.path.basename(model_path)} in {load_ms:.0f} ms "
+                    f"({loaded} loaded, {loaded_mb:.0f}/{self.memory_budget_mb} MB)")
+        return model, load_ms
+
+    def evict(self):
+        while len(self.models) > 1 and self.loaded_size_mb() > self.memory_budget_mb:
+            model_path, _ = self.models.popitem(last=False)
+            logger.info(f"Model pool evicted {os.path.basename(model_path)}")
+
+    def loaded_size_mb(self):
+        return sum(size for _, size, _ in self.models.values())
+
+    def record_swap(self, model_path, load_ms, total_ms):
+        self.swap_history.append({"model": model_path, "load_ms": load_ms, "swap_ms": total_ms})
+        logger.info(f"Swapped to {os.path.basename(model_path)}: {total_ms:.0f} ms from request to live "
+                    f"({'warm' if load_ms == 0 else f'{load_ms:.0f} ms load'})")
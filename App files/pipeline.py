@@ -0,0 +1,197 @@
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue, Empty, Full
+import threading
+import time
+
+from logger_config import get_logger
+logger = get_logger()
+
+
+class ImageJob:
+    """Per-image record handed from stage to stage."""
+
+    def __init__(self, image_path):
+        self.image_path = image_path
+        self.timestamps = {}  # stage name -> perf_counter, see metrics.py
+        self.content_hash = None
+        self.frame = None  # full resolution: what the model classifies
+        self.display_frame = None  # annotation_mode "display": the shrunk copy that is annotated and shown
+        self.frame_slot = None  # shared-memory slot holding the frames when decoded by a worker process
+        self.scale = 1.0  # display_frame width / frame width
+        self.probs = None
+        self.status_table = None
+        self.class_names = None
+        self.model_path = None
+        self.predicted_image = None
+        self.piece_status = None
+        self.pallet_id = None
+        self.position = None
+        self.failed_stage = None  # name of the stage whose handler raised on this image
+
+
+class PipelineStage:
+    """Worker thread that drains a bounded queue and hands its output to the next stage."""
+
+    def __init__(self, name, handler, shutdown_event, maxsize=0, batched=False, batch_size=1, batch_max_wait=0.0,
+                 workers=1, poll_interval=0.2, on_error=None, on_drop=None):
+        self.name = name
+        self.handler = handler
+        # on_error(item, stage name) -> what to forward instead of an item whose handler raised;
+        # without it the item is dropped (logged).
+        self.on_error = on_error
+        # on_drop(item) for every output the next stage refused because the pipeline is stopping.
+        self.on_drop = on_drop
+        self.shutdown_event = shutdown_event
+        self.input_queue = Queue(maxsize=maxsize)
+        self.batched = batched
+        self.batch_size = max(1, batch_size) if batched else 1
+        self.batch_max_wait = batch_max_wait
+        self.poll_interval = poll_interval
+
+        # With several workers the handler runs on a pool; futures are emitted in submission
+        # order so downstream stages still see items in arrival order.
+        self.workers = max(1, workers)
+        self.executor = None
+        self.emitter_thread = None
+        self.pending = Queue(maxsize=self.workers * 2)
+
+        self.next_stage = None
+        self.keep_running = True
+        self.thread = None
+        self.processed_count = 0
+
+    def connect(self, next_stage):
+        self.next_stage = next_stage
+        return next_stage
+
+    def is_running(self):
+        return self.keep_running and not self.shutdown_event.is_set()
+
+    def put(self, item):
+        """Blocking hand-off: waits while this stage is full so the producer slows down."""
+        while self.is_running():
+            try:
+                self.input_queue.put(item, timeout=self.poll_interval)
+                return True
+            except Full:
+                continue
+        return False
+
+    def depth(self):
+        return self.input_queue.qsize() + self.pending.qsize()
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.keep_running = True
+            if self.workers > 1:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"stage-{self.name}")
+                self.emitter_thread = threading.Thread(target=self.emit_pending, name=f"stage-{self.name}-emit", daemon=True)
+                self.emitter_thread.start()
+            self.thread = threading.Thread(target=self.run, name=f"stage-{self.name}", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.keep_running = False
+
+    def join(self, timeout=None):
+        for thread in (self.thread, self.emitter_thread):
+            if thread is not None:
+                thread.join(timeout)
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def next_items(self):
+        try:
+            items = [self.input_queue.get(timeout=self.poll_interval)]
+        except Empty:
+            return []
+
+        deadline = time.monotonic() + self.batch_max_wait
+        while len(items) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    items.append(self.input_queue.get(timeout=remaining))
+                else:
+                    items.append(self.input_queue.get_nowait())
+            except Empty:
+                break
+        return items
+
+    def call_handler(self, items):
+        try:
+            if self.batched:
+                return self.handler(items)
+            return [self.handler(items[0])]
+        except Exception:
+            logger.exception(f"Unexpected error in pipeline stage '{self.name}'")
+            if self.on_error is None:
+                return []
+            return [self.on_error(item, self.name) for item in items]
+
+    def forward(self, items, outputs):
+        self.processed_count += len(items)
+        if self.next_stage is None:
+            return
+
+        for index, output in enumerate(outputs):
+            if output is not None and not self.next_stage.put(output):
+                if self.on_drop is not None:
+                    for dropped in outputs[index:]:
+                        if dropped is not None:
+                            self.on_drop(dropped)
+                break
+
+    def run(self):
+        while self.is_running():
+            items = self.next_items()
+            if not items:
+                continue
+
+            if self.executor is None:
+                self.forward(items, self.call_handler(items))
+                continue
+
+            future = self.executor.submit(self.call_handler, items)
+            while self.is_running():
+                try:
+                    self.pending.put((items, future), timeout=self.poll_interval)
+                    break
+                except Full:
+                    continue
+
+    def emit_pending(self):
+        while self.is_running():
+            try:
+                items, future = self.pending.get(timeout=self.poll_interval)
+            except Empty:
+                continue
+            self.forward(items, future.result())
+
+
+class Pipeline:
+    def __init__(self, stages):
+        self.stages = stages
+        for stage, next_stage in zip(stages, stages[1:]):
+            stage.connect(next_stage)
+
+    @property
+    def head(self):
+        return self.stages[0]
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self):
+        for stage in self.stages:
+            stage.stop()
+
+    def join(self, timeout=None):
+        for stage in self.stages:
+            stage.join(timeout)
+
+    def queue_depths(self):
+        return {stage.name: stage.depth() for stage in self.stages}
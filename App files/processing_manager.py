@@ -3,8 +3,9 @@ from fatal_error_handler import install_tkinter_error_hook
 install_tkinter_error_hook()
 
 
-from logger_config import get_logger
+from logger_config import get_logger, get_image_logger
 logger = get_logger()
+image_logger = get_image_logger()
 
 
 from watchdog.observers import Observer
@@ -13,7 +14,7 @@ from queue import Queue
 import threading
 import time
 import os
-from PIL import ImageTk, Image, ImageFile
+from PIL import ImageFile
 import PIL
 ImageFile.LOAD_TRUNCATED_IMAGES = True
 import cv2
@@ -22,21 +23,58 @@ import os
 import numpy as np
 import time
 from collections import OrderedDict
+from datetime import datetime
 from threading import Lock
 
+from pipeline import ImageJob, Pipeline, PipelineStage
+from image_io import decode_frame, fit_display_frame, draw_status_border, frame_to_image, save_frame
+from backlog_scanner import BacklogScanner, ProcessedIndex, capture_time
+from inference_backends import create_inference_backend, build_status_table
+from model_pool import ModelPool, model_fingerprint
+from result_cache import content_hash
+from inference_executor import InferenceExecutor
+from frame_workers import create_frame_worker_pool
+from result_store import create_result_store
+from metrics import create_pipeline_metrics
+from startup_timer import get_startup_timer
+startup_timer = get_startup_timer()
 
 
 
 
+
+JPEG_END_MARKER = b"\xff\xd9"
+PNG_END_MARKER = b"IEND\xaeB`\x82"
+
+
 class ImageHandler(FileSystemEventHandler):
-    def __init__(self, image_queue, debounce_seconds=1.0, max_cache_size=100):
+    def __init__(self, image_queue, debounce_seconds=1.0, max_cache_size=100, retry_interval=0.3, max_attempts=5,
+                 tail_bytes=64, claim=None, release=None, metrics=None, line_name=None):
         self.image_queue = image_queue
+        self.claim = claim
+        self.release = release
+        self.metrics = metrics
+        self.line_name = line_name
         self.debounce_seconds = debounce_seconds
         self.max_cache_size = max_cache_size
+        self.retry_interval = retry_interval
+        self.max_attempts = max_attempts
+        self.tail_bytes = tail_bytes
         self.recent_events = OrderedDict()
+        self.pending = {}
         self.lock = Lock()
 
+        # Ready files reach the pipeline through this thread, so a full decode queue blocks the feeder,
+        # never the observer; files waiting here show up as the "watcher" queue depth.
+        self.ready_paths = Queue()
+        self.feeder = threading.Thread(target=self.feed, name="watch-feeder", daemon=True)
+        self.feeder.start()
+
     def handle_event(self, event):
+        """
+        Runs on the observer thread, so it only ever does a tail read: it never sleeps and never waits
+        on the pipeline (re-checks run on timers, the hand-off on the feeder thread).
+        """
         path = event.src_path
         now = time.time()
 
@@ -47,26 +85,89 @@ class ImageHandler(FileSystemEventHandler):
             self._cleanup_old_entries(now)
             last_time = self.recent_events.get(path)
             if last_time and now - last_time < self.debounce_seconds:
-                return 
+                return
+            first_event = path not in self.pending
+            if first_event:
+                self.pending[path] = 0
+
+        if first_event:
+            image_logger.info("Image event detected: {}", path)
+            if self.metrics is not None:
+                self.metrics.mark(path, "event")
+            self.check_ready(path)
+        elif self.is_image_fully_written(path):
+            # Follow-up events only shortcut the pending timer; they never start another one.
+            self.enqueue(path)
+
+    def check_ready(self, path):
+        if self.is_image_fully_written(path):
+            self.enqueue(path)
+            return
+
+        with self.lock:
+            if path not in self.pending:
+                return
+            attempt = self.pending[path] + 1
+            self.pending[path] = attempt
+            if attempt >= self.max_attempts:
+                del self.pending[path]
+                logger.error(f"Image was never ready after {self.max_attempts} attempts: {path}")
+                if self.metrics is not None:
+                    self.metrics.drop(self.line_name, path, "never_ready")
+                return
+
+        logger.warning(f"[{attempt}/{self.max_attempts}] File not ready yet: {path}")
+        timer = threading.Timer(self.retry_interval * attempt, self.recheck, args=(path, attempt))
+        timer.daemon = True
+        timer.start()
+
+    def recheck(self, path, attempt):
+        with self.lock:
+            # A close/modify event may already have queued the file, or re-armed a newer timer.
+            if self.pending.get(path) != attempt:
+                return
+        self.check_ready(path)
 
-            self.recent_events[path] = now
+    def enqueue(self, path):
+        with self.lock:
+            if path not in self.pending:
+                return
+            del self.pending[path]
+            self.recent_events[path] = time.time()
             if len(self.recent_events) > self.max_cache_size:
                 self.recent_events.popitem(last=False)
 
-        logger.info(f"Image event detected: {path}")
-        for attempt in range(5):
-            if self.is_image_fully_written(path):
-                try:
-                    self.image_queue.put(path, block=False)
-                    logger.info(f"Image queued for processing: {path}")
-                except Exception as e:
-                    logger.warning(f"Failed to enqueue image: {e}")
-                break
-            else:
-                logger.warning(f"[{attempt+1}/5] File not ready yet: {path}")
-                time.sleep(0.3)
-        else:
-            logger.error(f"Image was never ready after 5 attempts: {path}")
+        # Claimed first: if the scanner (or an earlier event) already holds the path, its timestamps
+        # belong to that copy and must be neither overwritten nor taken here.
+        if self.claim is not None and not self.claim(path):
+            return
+        if self.metrics is not None:
+            self.metrics.mark(path, "ready")
+            # Marked before the hand-off: once it is in the queue a decode worker may already take the timestamps.
+            # Waiting for the feeder or a full decode queue therefore shows up in the "decoded" latency.
+            self.metrics.mark(path, "queued")
+        self.ready_paths.put(path)
+
+    def feed(self):
+        while True:
+            path = self.ready_paths.get()
+            if path is None:
+                return
+            if self.image_queue.put(path):
+                image_logger.info("Image queued for processing: {}", path)
+                continue
+            logger.warning(f"Pipeline stopped before image could be queued: {path}")
+            if self.release is not None:
+                self.release(path, processed=False)
+            if self.metrics is not None:
+                self.metrics.drop(self.line_name, path, "pipeline_stopped")
+
+    def depth(self):
+        return self.ready_paths.qsize()
+
+    def stop(self):
+        """Once the pipeline is stopped: files still waiting are released, then the feeder exits."""
+        self.ready_paths.put(None)
 
     def on_created(self, event):
         self.handle_event(event)
@@ -74,30 +175,33 @@ class ImageHandler(FileSystemEventHandler):
     def on_modified(self, event):
         self.handle_event(event)
 
-    def is_image_fully_written(self, path, wait_time=1.0, interval=0.2):
-        end_time = time.time() + wait_time
-        last_size = -1
+    def on_closed(self, event):
+        # inotify close-after-write: the writer is done, so the end-marker check normally passes first time.
+        self.handle_event(event)
 
-        while time.time() < end_time:
-            try:
-                current_size = os.path.getsize(path)
-                if current_size == last_size:
-                    with open(path, "rb") as f:
-                        f.read()
-                    return True
-                last_size = current_size
-            except OSError:
-                pass
-            time.sleep(interval)
-
-        return False
+    def is_image_fully_written(self, path):
+        """Check the end-of-image marker by reading only the last few bytes of the file."""
+        try:
+            with open(path, "rb") as f:
+                size = f.seek(0, os.SEEK_END)
+                if size < len(PNG_END_MARKER):
+                    return False
+                f.seek(max(0, size - self.tail_bytes))
+                tail = f.read()
+        except OSError:
+            return False
+
+        if path.lower().endswith('.png'):
+            return tail.endswith(PNG_END_MARKER)
+        # Some cameras pad the file with zeros after the JPEG EOI marker.
+        return tail.rstrip(b"\x00").endswith(JPEG_END_MARKER)
 
     def _cleanup_old_entries(self, now):
         expired_keys = [k for k, t in self.recent_events.items() if now - t > self.debounce_seconds]
         for key in expired_keys:
             del self.recent_events[key]
 
-       
+
 
 class ProcessingManager:
     def __init__(self, 
@@ -106,15 +210,27 @@ class ProcessingManager:
                  update_callback=None, 
                  shutdown_event=None, 
                  update_grid_callback=None, 
-
+                 model_pool=None,
+                 model_state_callback=None,
+                 result_callback=None,
+                 config_path="config.json",
+                 inference_executor=None,
+                 line_config=None,
+                 frame_workers=None,
+                 result_store=None,
+                 metrics=None,
             ):
         
         self.model_path = model_path
+        self.requested_model = (model_path, model_fingerprint(model_path))
         self.observer = Observer()
         self.keep_processing = True
         self.model = None
         self.update_callback = update_callback
         self.update_batch_callback = update_grid_callback
+        self.model_state_callback = model_state_callback
+        self.result_callback = result_callback
+        self.first_inference_done = False
 
 
 
@@ -125,13 +241,16 @@ class ProcessingManager:
 
 
         try:
-            with open("config.json", "r") as config_file:
+            with open(config_path, "r") as config_file:
                 config = json.load(config_file)
             self.prediction_parameters = config["prediction_parameters"]
             self.plotting_parameters = config["plotting_parameters"]
             self.status_logic = config["status_logic"]
 
-            grid_config = config["grid_config"]
+            # A line from the "lines" list overrides the single-folder defaults it sets.
+            line_config = line_config or {}
+            self.line_name = line_config.get("name", "line_1")
+            grid_config = line_config.get("grid_config") or config["grid_config"]
             self.rows = grid_config["rows"]
             self.columns = grid_config["columns"]
             self.total_pieces = grid_config["total_pieces"]
@@ -139,6 +258,23 @@ class ProcessingManager:
             self.enable_grid = config["enable_grid"]
 
             self.queue_size = config["queue_size"]
+            self.batch_size = max(1, int(config.get("batch_size", 1)))
+            self.batch_max_wait = config.get("batch_max_wait_ms", 0) / 1000.0
+            self.stage_queue_size = config.get("stage_queue_size", 8)
+            self.decode_workers = max(1, int(config.get("decode_workers", 1)))
+            self.processed_index_path = line_config.get("processed_index_path", config.get("processed_index_path"))
+            self.processed_index_size = config.get("processed_index_size", 20000)
+            self.processed_index_skip_existing = config.get("processed_index_skip_existing", False)
+            self.annotation_mode = config.get("annotation_mode", "full")
+            self.display_max_size = tuple(config.get("display_max_size", (960, 640)))
+            self.save_annotated = config.get("save_annotated", False)
+            self.annotated_output_path = config.get("annotated_output_path", "./annotated_images")
+            self.inference_backend = config.get("inference_backend", "ultralytics")
+            self.model_backends = config.get("model_backends", {})
+            self.model_pool_memory_mb = config.get("model_pool_memory_mb", 1024)
+            self.min_quantized_agreement = config.get("min_quantized_agreement", 0.99)
+            self.result_cache_size = config.get("result_cache_size", 1000)
+            self.frame_worker_processes = int(config.get("frame_worker_processes", 0))
 
         except Exception as e:
             logger.exception("Failed to load configuration")
@@ -146,33 +282,136 @@ class ProcessingManager:
 
         
         self.watch_single_folder_path = watch_single_folder_path
-        self.single_image_queue = Queue(maxsize=self.queue_size)
+        self.display_image_callback = None
 
+        self.model_pool = model_pool if model_pool is not None else ModelPool(self.model_pool_memory_mb)
 
+        # Lines built by ProductionLines share one executor; a standalone manager gets its own.
+        self.owns_executor = inference_executor is None
+        self.inference_executor = inference_executor or InferenceExecutor(
+            shutdown_event, self.batch_size, self.batch_max_wait, self.result_cache_size)
+        self.result_cache = self.inference_executor.result_cache
 
+        # Decode/annotation worker processes, shared the same way; None keeps everything in threads.
+        self.owns_frame_workers = frame_workers is None
+        self.frame_workers = frame_workers if frame_workers is not None else create_frame_worker_pool(config, shutdown_event)
+        if self.frame_workers is not None:
+            # Pipeline threads only wait on the workers, so keep one per process busy.
+            self.decode_workers = max(self.decode_workers, self.frame_worker_processes)
 
-    def load_model(self):
-        from ultralytics import YOLO
+        self.owns_result_store = result_store is None
+        self.result_store = result_store if result_store is not None else create_result_store(config)
+        self.pallet_id = None
+
+        self.owns_metrics = metrics is None
+        self.metrics = metrics if metrics is not None else create_pipeline_metrics(config)
+
+        self.event_handler = None
+        self.processed_index = ProcessedIndex(self.processed_index_path, self.processed_index_size,
+                                              self.processed_index_skip_existing)
+        self.in_flight = set()
+        self.in_flight_lock = Lock()
+
+        self.pipeline = self.build_pipeline()
+        self.single_image_queue = self.pipeline.head.input_queue
+        self.metrics.add_queue_depth_source(self.line_name, self.get_queue_depths)
 
+
+
+
+    def load_model(self):
         try:
+                self.report_model_state("loading")
                 logger.info(f"Initializing YOLO model using the path: {self.model_path}")
-                self.model = YOLO(self.model_path)
+                self.model, _ = self.model_pool.acquire(self.model_path, self.create_backend)
                 logger.info("YOLO model loaded successfully.")
+                self.report_model_state("ready")
 
         except Exception as e:
                 logger.exception("Failed to load the models")
+                self.report_model_state("failed")
                 raise
 
+    def create_backend(self, model_path):
+        backend_name = self.model_backends.get(os.path.basename(model_path), self.inference_backend)
+        # Taken before loading, so weights replaced mid-load read as a different model next time.
+        fingerprint = model_fingerprint(model_path)
+        with startup_timer.phase("model_load"):
+            backend = create_inference_backend(model_path, self.prediction_parameters, backend_name,
+                                               self.min_quantized_agreement)
+
+        # A dummy frame at the model's input size, so the first real piece does not pay for lazy init.
+        self.report_model_state("warming up")
+        with startup_timer.phase("warmup"):
+            backend.warmup()
+
+        # Resolved once per model, so annotation is an index lookup instead of a keyword search per image.
+        backend.status_table = build_status_table(backend.names, self.status_logic)
+        # Part of the model identity the result cache is keyed by.
+        backend.fingerprint = fingerprint
+        return backend
+
+    def report_model_state(self, state):
+        if self.model_state_callback is not None:
+            try:
+                self.model_state_callback(state)
+            except Exception:
+                logger.exception("Error reporting model state")
+
+    def request_model_swap(self, model_path):
+        """Load (or fetch from the pool) and warm the model off the pipeline, then swap it in between batches."""
+        if not model_path:
+            return
+        # The same path with a new fingerprint (retrained weights uploaded over the file) is a new model.
+        requested = (model_path, model_fingerprint(model_path))
+        if requested == self.requested_model:
+            return
+        self.requested_model = requested
+        if self.model is not None and requested == (self.model_path, self.model.fingerprint):
+            # Switched back before a pending swap finished; that swap is now superseded.
+            return
+        threading.Thread(target=self.swap_model, args=(model_path,), daemon=True).start()
+
+    def swap_model(self, model_path):
+        requested_at = time.perf_counter()
+        try:
+            self.report_model_state("loading")
+            model, load_ms = self.model_pool.acquire(model_path, self.create_backend)
+        except Exception:
+            logger.exception(f"Failed to load model for swap: {model_path}")
+            self.report_model_state("failed")
+            return
+
+        if (model_path, model.fingerprint) != self.requested_model:
+            logger.info(f"Swap to {os.path.basename(model_path)} superseded by a newer selection.")
+            return
+
+        # The executor reads self.model once per batch, so the swap lands on an image boundary
+        # and queued images are simply classified by the new model.
+        self.model = model
+        self.model_path = model_path
+        # The result cache is shared with the other lines and keyed by model identity (path and file
+        # fingerprint), so it is left alone: the new model, even at the same path, never sees the old one's
+        # outputs, and switching back still hits.
+        self.model_pool.record_swap(model_path, load_ms, (time.perf_counter() - requested_at) * 1000.0)
+        self.report_model_state("ready")
+
 
     def start_monitoring(self):
 
-        event_handler = ImageHandler(self.single_image_queue)
-        self.observer.schedule(event_handler, self.watch_single_folder_path, recursive=False)
+        self.event_handler = ImageHandler(self.pipeline.head, claim=self.claim_image, release=self.release_image,
+                                          metrics=self.metrics, line_name=self.line_name)
+        self.observer.schedule(self.event_handler, self.watch_single_folder_path, recursive=False)
         logger.info("Started monitoring the folder for new images...")
-        threading.Thread(target=lambda:self.monitor_queue(self.watch_single_folder_path, self.single_image_queue), daemon=True).start()
-
         self.observer.start()
 
+        # The observer is already running, so nothing dropped during the scan is missed;
+        # claim_image() keeps files seen by both from being queued twice.
+        scanner = BacklogScanner(self.watch_single_folder_path, self.pipeline.head, self.processed_index,
+                                 claim=self.claim_image, release=self.release_image, metrics=self.metrics,
+                                 line_name=self.line_name)
+        threading.Thread(target=scanner.enqueue_backlog, daemon=True).start()
+
     def stop_monitoring(self):
         logger.info("Stopping observer...")
 
@@ -181,65 +420,275 @@ class ProcessingManager:
             self.observer.join()
 
         self.keep_processing = False
+        self.pipeline.stop()
+        if self.event_handler is not None:
+            self.event_handler.stop()
+            self.event_handler = None
+        if self.owns_executor:
+            self.inference_executor.stop()
+
+    def build_pipeline(self):
+        """watcher -> decode -> inference (shared executor) -> annotate -> publish, with bounded blocking hand-off."""
+        stages = [
+            PipelineStage("decode", self.decode_image, self.shutdown_event, maxsize=self.queue_size,
+                          workers=self.decode_workers, on_error=self.fail_item, on_drop=self.abandon_item),
+            self.inference_executor.add_line(self.line_name, lambda: self.model, self.stage_queue_size,
+                                             on_drop=self.abandon_item),
+            PipelineStage("annotate", self.annotate_item, self.shutdown_event, maxsize=self.stage_queue_size,
+                          on_error=self.fail_item, on_drop=self.abandon_item),
+            PipelineStage("publish", self.publish_item, self.shutdown_event, maxsize=self.stage_queue_size),
+        ]
+        return Pipeline(stages)
+
+    def get_queue_depths(self):
+        depths = self.pipeline.queue_depths()
+        event_handler = self.event_handler
+        if event_handler is not None:
+            depths = {"watcher": event_handler.depth(), **depths}
+        return depths
+
+    def claim_image(self, image_path):
+        """Returns False if the image is already queued or being processed."""
+        with self.in_flight_lock:
+            if image_path in self.in_flight:
+                return False
+            self.in_flight.add(image_path)
+            return True
+
+    def release_image(self, image_path, processed=True):
+        with self.in_flight_lock:
+            self.in_flight.discard(image_path)
+        if processed:
+            self.processed_index.add(os.path.basename(image_path), capture_time(image_path))
 
 
 
     def process_image_core(self, image_path):
-
-        self.processing_active = True
-        logger.info(f"Processing image: {os.path.basename(image_path)}")
+        predicted_image, piece_status = self.process_batch_core([image_path])[0]
+        return predicted_image, piece_status
+
+    def process_batch_core(self, image_paths):
+        """Run the pipeline stages synchronously over the given paths, results in input order."""
+        if self.frame_workers is not None and len(image_paths) > self.frame_workers.ring.slots:
+            # Every decoded frame holds a slot until it is annotated, so never decode more than fit.
+            slots = self.frame_workers.ring.slots
+            outputs = []
+            for start in range(0, len(image_paths), slots):
+                outputs.extend(self.process_batch_core(image_paths[start:start + slots]))
+            return outputs
+
+        outputs = [(None, "nok")] * len(image_paths)
+        jobs = []
+        indices = []
+
+        for index, image_path in enumerate(image_paths):
+            job = self.decode_image(image_path)
+            if job is not None:
+                jobs.append(job)
+                indices.append(index)
+
+        for index, job in zip(indices, self.infer_batch(jobs)):
+            job = self.annotate_item(job, render=True)
+            outputs[index] = (job.predicted_image, job.piece_status)
+
+        return outputs
+
+    def decode_image(self, image_path):
         if not os.path.exists(image_path):
             logger.error(f"Image not found: {image_path}. Skipping processing.")
-            return None, "nok"
-        
-        try:
+            self.release_image(image_path, processed=False)
+            self.metrics.drop(self.line_name, image_path, "missing")
+            return None
 
-            image = Image.open(image_path)
-
-            results = self.model.predict(
-                    source=image,
-                    iou=self.prediction_parameters.get("iou", 0.5),
-                    conf=self.prediction_parameters.get("conf", 0.6),
-                    classes=self.prediction_parameters.get("classes"),
-                    save=False
-                )
-
-            result = results[0]
-            print(result)
-            piece_status = None
-            predicted_image = None
-                
-            if hasattr(result, "probs") and result.probs is not None:
-                    probs = result.probs.data.cpu().numpy()
-                    class_id = int(np.argmax(probs))
-                    class_name = self.model.names[class_id]
-                    confidence = probs[class_id]
-
-                    for status, keywords in self.status_logic.items():
-                        if any(keyword in class_name.lower() for keyword in keywords):
-                            piece_status = status
-                            break
-
-                    image_np = np.array(image)
-                    label_color = (0, 255, 0) if piece_status == "ok" else (255, 0, 0)
-                    thickness = 40
-
-                    h, w, _ = image_np.shape
-                    cv2.rectangle(image_np, (0, 0), (w - 1, h - 1), label_color, thickness)
-
-                    predicted_image = Image.fromarray(image_np)
-            else:
-                    logger.warning("Unknown YOLO model output type. Defaulting to NOK.")
-                    predicted_image = image
-                
-            self.processing_active = False
-            
-            return predicted_image, piece_status
-        
-        except (OSError, IOError, PIL.UnidentifiedImageError) as e:
+        image_logger.info("Processing image: {}", os.path.basename(image_path))
+        job = ImageJob(image_path)
+        job.timestamps = self.metrics.take(image_path)
+        try:
+            # The model always gets the full-resolution frame; "display" mode only shrinks what is annotated and shown.
+            max_size = self.display_max_size if self.annotation_mode == "display" else None
+            if self.frame_workers is not None:
+                # Waiting for a free slot ends when this line's pipeline stops, even if the shared pool runs on.
+                decoded = self.frame_workers.decode(image_path, max_size, self.pipeline.head.is_running)
+                if decoded is None:
+                    self.release_image(image_path, processed=False)
+                    self.metrics.drop(self.line_name, image_path, "pipeline_stopped")
+                    return None
+                job.frame, job.display_frame, job.scale, job.content_hash, job.frame_slot = decoded
+                job.timestamps["decoded"] = time.perf_counter()
+                return job
+
+            # Read once: the same bytes are hashed for the result cache and decoded.
+            buffer = np.fromfile(image_path, dtype=np.uint8)
+            job.content_hash = content_hash(buffer)
+            job.frame = decode_frame(image_path, buffer)
+            if max_size is not None:
+                job.display_frame, job.scale = fit_display_frame(job.frame, max_size)
+            job.timestamps["decoded"] = time.perf_counter()
+        except (OSError, IOError, PIL.UnidentifiedImageError, cv2.error) as e:
             logger.error(f"Error processing image {image_path}: {e}")
+            self.metrics.drop(self.line_name, image_path, "decode_error")
             os.remove(image_path)
-            return None, "nok"
+        return job
+
+    def fail_item(self, item, stage):
+        """
+        A stage raised on item (an image path before decode, an ImageJob after): it is passed on as a NOK
+        without probs, like a failed inference batch, so publish still counts it and releases its claim.
+        """
+        if isinstance(item, ImageJob):
+            job = item
+        else:
+            job = ImageJob(item)
+            job.timestamps = self.metrics.take(item)
+        if job.frame_slot is not None:
+            self.frame_workers.release(job.frame_slot)
+            job.frame_slot = None
+        job.frame = None
+        job.display_frame = None
+        job.probs = None
+        job.piece_status = "nok"
+        job.failed_stage = stage
+        return job
+
+    def abandon_item(self, job):
+        """The pipeline stopped before job reached publish: give back its frame slot and its claim."""
+        if job.frame_slot is not None:
+            self.frame_workers.release(job.frame_slot)
+            job.frame_slot = None
+        self.release_image(job.image_path, processed=False)
+        self.metrics.drop(self.line_name, job.image_path, "pipeline_stopped")
+
+    def infer_batch(self, jobs):
+        """Synchronous inference for process_batch_core; the live pipeline goes through the executor."""
+        self.processing_active = True
+        try:
+            return self.inference_executor.infer(jobs, self.model)
+        finally:
+            self.processing_active = False
+
+    def annotate_item(self, job, render=None):
+        if job.frame is None:
+            job.piece_status = "nok"
+            return job
+
+        # Headless runs have no display, so only the status is needed; the PIL conversion is skipped.
+        if render is None:
+            render = self.display_image_callback is not None
+        if job.frame_slot is not None:
+            try:
+                return self.annotate_in_worker(job, render)
+            finally:
+                self.frame_workers.release(job.frame_slot)
+                job.frame_slot = None
+                job.frame = None
+                job.display_frame = None
+
+        display_frame = job.display_frame if job.display_frame is not None else job.frame
+        job.predicted_image, job.piece_status = self.annotate_result(display_frame, job.probs, job.scale,
+                                                                     job.status_table, render)
+        if self.save_annotated:
+            self.persist_annotated(job)
+        job.frame = None
+        job.display_frame = None
+        return job
+
+    def annotate_in_worker(self, job, render):
+        """annotate_result and persist_annotated for a frame that lives in a shared-memory slot."""
+        job.piece_status = None
+        if job.probs is not None:
+            class_id = int(np.argmax(job.probs))
+            job.piece_status = (job.status_table or self.model.status_table).get(class_id)
+        else:
+            logger.warning("Unknown YOLO model output type. Defaulting to NOK.")
+
+        save_path = None
+        if self.save_annotated:
+            save_path = os.path.join(self.annotated_output_path, os.path.basename(job.image_path))
+        if render and job.probs is None:
+            # Nothing to draw, as in annotate_result: the display shows the frame as decoded.
+            job.predicted_image = frame_to_image(job.display_frame if job.display_frame is not None else job.frame)
+            render = False
+        if not (render or save_path):
+            return job
+
+        try:
+            job.predicted_image = self.frame_workers.annotate(job.frame_slot, job.frame, job.display_frame,
+                                                              job.piece_status, job.scale, render, save_path)
+        except (OSError, IOError, cv2.error) as e:
+            logger.error(f"Failed to annotate image {job.image_path} in a worker process: {e}")
+        return job
+
+    def publish_item(self, job):
+        try:
+            self.publish_result(job)
+            job.timestamps["displayed"] = time.perf_counter()
+            if job.failed_stage is not None:
+                self.metrics.drop(self.line_name, job.image_path, f"{job.failed_stage}_failed")
+            elif job.probs is None and "decoded" in job.timestamps:
+                self.metrics.drop(self.line_name, job.image_path, "inference_failed")
+            self.metrics.observe(self.line_name, job.timestamps, job.piece_status)
+            if self.result_callback is None and self.result_store is None:
+                return
+            record = self.build_result_record(job)
+            if self.result_callback is not None:
+                self.result_callback(record)
+            if self.result_store is not None:
+                # End to end, like the metrics "total": from the image's first timestamp (the watcher event,
+                # or queued for backlog images) to displayed, so queue waits before decode are included.
+                latency_ms = (job.timestamps["displayed"] - min(job.timestamps.values())) * 1000.0
+                self.result_store.record_result(self.line_name, record, job.model_path, latency_ms,
+                                                job.pallet_id, job.position)
+        finally:
+            self.release_image(job.image_path)
+
+    def build_result_record(self, job):
+        record = {
+            "image": os.path.basename(job.image_path),
+            "path": job.image_path,
+            "status": job.piece_status,
+            "class_name": None,
+            "confidence": None,
+        }
+        if job.probs is not None:
+            class_id = int(np.argmax(job.probs))
+            record["class_name"] = (job.class_names or {}).get(class_id)
+            record["confidence"] = round(float(job.probs[class_id]), 5)
+        return record
+
+    def annotate_result(self, image, probs, scale=1.0, status_table=None, render=True):
+        piece_status = None
+        predicted_image = None
+
+        if probs is not None:
+                class_id = int(np.argmax(probs))
+                piece_status = (status_table or self.model.status_table).get(class_id)
+
+                if render:
+                    self.draw_status_border(image, piece_status, scale)
+                    predicted_image = frame_to_image(image)
+        else:
+                logger.warning("Unknown YOLO model output type. Defaulting to NOK.")
+                if render:
+                    predicted_image = frame_to_image(image)
+
+        return predicted_image, piece_status
+
+    def draw_status_border(self, frame, piece_status, scale=1.0):
+        draw_status_border(frame, piece_status, scale)
+
+    def persist_annotated(self, job):
+        """Full-resolution annotation only happens here, when the annotated image is actually kept."""
+        try:
+            # In "full" mode the display border may already be drawn on job.frame; it is the same border.
+            frame = job.frame
+            self.draw_status_border(frame, job.piece_status)
+            os.makedirs(self.annotated_output_path, exist_ok=True)
+            save_frame(frame, os.path.join(self.annotated_output_path, os.path.basename(job.image_path)))
+        except (OSError, IOError, cv2.error) as e:
+            logger.error(f"Failed to save annotated image {job.image_path}: {e}")
+
+    def get_batch_stats(self):
+        return self.inference_executor.get_batch_stats()
 
     def process_single_image(self, display_image_callback):
         """Process images in single mode."""
@@ -247,96 +696,112 @@ class ProcessingManager:
             if self.model is None and not self.shutdown_event.is_set():
                 self.load_model()
 
-            processed_results = {}
-            cell_positions = self.generate_cell_positions()
-            processed_count = 0
+            self.display_image_callback = display_image_callback
+            self.processed_results = {}
+            self.cell_positions = self.generate_cell_positions()
+            self.processed_count = 0
+
+            self.pipeline.start()
+            if self.owns_executor:
+                self.inference_executor.start()
+            if self.owns_metrics:
+                self.metrics.start()
+            logger.info(f"Processing pipeline started for {self.line_name}.")
 
             while self.keep_processing and not self.shutdown_event.is_set():
-                if not self.single_image_queue.empty():
-                    try:
-                        image_path = self.single_image_queue.get()
-
-                        if not os.path.exists(image_path):
-                            logger.error(f"Image not found: {image_path}")
-                            continue
-                        predicted_image, piece_status = self.process_image_core(image_path)
-
-                        logger.info(f"Processed image status: {piece_status}")
-
-                        if predicted_image:
-                            display_image_callback(predicted_image)
-                        else:
-                            logger.warning("No processed image available to display.")
-
-                        if predicted_image is not None and piece_status is not None:
-                            display_image_callback(predicted_image)
-                            self.update_callback(piece_status)
-                        
-                        if self.enable_grid:
-                            if processed_count == 0:
-                                processed_results.clear()
-                                try:
-                                    self.update_batch_callback({
-                                        "status": "start_new_palette"
-                                    })
-                                except Exception as e:
-                                    logger.exception("Error sending 'start_new_palette' grid update")
-
-                            if processed_count < len(cell_positions):
-                                position = cell_positions[processed_count]
-                            else:
-                                processed_count = 0
-                                processed_results.clear()
-                                try:
-                                    self.update_batch_callback({
-                                        "status": "start_new_palette"
-                                    })
-                                except Exception as e:
-                                    logger.exception("Error sending 'start_new_palette' grid update after overflow")
-
-                                position = cell_positions[processed_count]
-                            processed_results[position] = piece_status
-
-                            try:
-                                self.update_batch_callback({
-                                    "status": "update_cell",
-                                    "position": position,
-                                    "piece_status": piece_status,
-                                    "grid": processed_results.copy(),
-                                    "count": processed_count + 1
-                                })
-                            except Exception as e:
-                                logger.exception("Error sending 'update_cell' grid update")
-
-                            processed_count += 1
-
-                            if processed_count == self.total_pieces:
-                                try:
-                                    self.update_batch_callback({
-                                        "status": "palette_complete",
-                                        "grid": processed_results.copy(),
-                                        "count": processed_count
-                                    })
-                                except Exception as e:
-                                    logger.exception("Error sending 'palette_complete' grid update")
-
-                                processed_count = 0
-                                processed_results.clear()
-
-
-
-
-                    except FileNotFoundError as e:
-                        logger.error(f"File not found: {e}")
-                        continue
-                    except Exception as e:
-                        logger.exception(f"Unexpected error processing image: {e}")
-                        continue
-
-                time.sleep(0.5)
+                self.shutdown_event.wait(1.0)
+
+            self.pipeline.stop()
+            self.pipeline.join(timeout=2.0)
+            if self.owns_executor:
+                self.inference_executor.stop()
+                self.inference_executor.join(timeout=2.0)
+            if self.owns_frame_workers and self.frame_workers is not None:
+                self.frame_workers.shutdown()
+            if self.owns_result_store and self.result_store is not None:
+                self.result_store.close()
+            self.processed_index.close()
+            if self.owns_metrics:
+                self.metrics.stop()
         except Exception as e:
             logger.exception("Unexpected error during image processing")
-            
+
+    def publish_result(self, job):
+        piece_status = job.piece_status
+        image_logger.info("Processed image status: {}", piece_status)
+
+        if self.display_image_callback is not None:
+            if job.predicted_image:
+                self.display_image_callback(job.predicted_image)
+            else:
+                logger.warning("No processed image available to display.")
+
+        if job.probs is not None and piece_status is not None and self.update_callback is not None:
+            self.update_callback(piece_status)
+
+        if not self.enable_grid:
+            return
+
+        if self.processed_count == 0:
+            self.processed_results.clear()
+            self.begin_pallet()
+            try:
+                self.update_batch_callback({
+                    "status": "start_new_palette"
+                })
+            except Exception as e:
+                logger.exception("Error sending 'start_new_palette' grid update")
+
+        if self.processed_count < len(self.cell_positions):
+            position = self.cell_positions[self.processed_count]
+        else:
+            self.processed_count = 0
+            self.processed_results.clear()
+            self.begin_pallet()
+            try:
+                self.update_batch_callback({
+                    "status": "start_new_palette"
+                })
+            except Exception as e:
+                logger.exception("Error sending 'start_new_palette' grid update after overflow")
+
+            position = self.cell_positions[self.processed_count]
+        self.processed_results[position] = piece_status
+        job.pallet_id = self.pallet_id
+        job.position = position
+
+        try:
+            self.update_batch_callback({
+                "status": "update_cell",
+                "position": position,
+                "piece_status": piece_status,
+                "count": self.processed_count + 1
+            })
+        except Exception as e:
+            logger.exception("Error sending 'update_cell' grid update")
+
+        self.processed_count += 1
+
+        if self.processed_count == self.total_pieces:
+            try:
+                self.update_batch_callback({
+                    "status": "palette_complete",
+                    "count": self.processed_count
+                })
+            except Exception as e:
+                logger.exception("Error sending 'palette_complete' grid update")
+
+            if self.result_store is not None:
+                self.result_store.complete_pallet(self.pallet_id)
+
+            self.processed_count = 0
+            self.processed_results.clear()
+
+    def begin_pallet(self):
+        self.pallet_id = f"{self.line_name}-{datetime.now():%Y%m%d-%H%M%S-%f}"
+        if self.result_store is not None:
+            self.result_store.start_pallet(self.pallet_id, self.line_name)
+
     def generate_cell_positions(self):
         positions = []
         for row in range(self.rows):
@@ -345,11 +810,3 @@ class ProcessingManager:
             else:
                 positions.extend([(row, col) for col in reversed(range(self.columns))])
         return positions
-
-    def monitor_queue(self, folder_to_watch, image_queue):
-        inactivity_start = time.time()
-        while self.keep_processing and not self.shutdown_event.is_set():
-            if not any(filename.lower().endswith(('.jpg', '.png', '.jpeg')) for filename in os.listdir(folder_to_watch)):
-                time.sleep(1)
-                continue
-
@@ -0,0 +1,146 @@
+import json
+import os
+import threading
+
+from inference_executor import InferenceExecutor
+from model_pool import ModelPool
+from logger_config import get_logger
+logger = get_logger()
+
+
+def load_line_configs(config):
+    """
+    The "lines" list from config.json, one dict per camera/watch folder with a name, watch_folder_path,
+    grid_config, optional model_path and processed_index_path. Without "lines", the single-folder keys
+    describe one line, so existing configs keep working.
+    """
+    lines = config.get("lines")
+    if not lines:
+        return [{
+            "name": "line_1",
+            "watch_folder_path": config["watch_single_folder_path"],
+            "grid_config": config["grid_config"],
+            "model_path": None,
+            "processed_index_path": config.get("processed_index_path"),
+        }]
+
+    line_configs = []
+    index_stem, index_ext = os.path.splitext(config.get("processed_index_path") or "./processed_index.txt")
+    for number, line in enumerate(lines, start=1):
+        name = line.get("name", f"line_{number}")
+        line_configs.append({
+            "name": name,
+            "watch_folder_path": line["watch_folder_path"],
+            "grid_config": line.get("grid_config", config["grid_config"]),
+            "model_path": line.get("model_path"),
+            # File names are only unique per camera, so every line keeps its own processed index.
+            "processed_index_path": line.get("processed_index_path", f"{index_stem}_{name}{index_ext}"),
+        })
+
+    names = [line["name"] for line in line_configs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Line names must be unique, got {names}")
+    return line_configs
+
+
+class ProductionLines:
+    """
+    One ProcessingManager per configured line (own folder, grid, counters and pallet state),
+    all classifying through a single InferenceExecutor and ModelPool, recording to one ResultStore and
+    PipelineMetrics (and one FrameWorkerPool when frame_worker_processes is set).
+    line_callbacks(name) returns the callback keyword arguments for that line's ProcessingManager.
+    """
+
+    def __init__(self, config_path, default_model_path, shutdown_event, line_callbacks, model_pool=None,
+                 watch_folder_path=None):
+        with open(config_path, "r") as config_file:
+            config = json.load(config_file)
+
+        self.shutdown_event = shutdown_event
+        self.line_configs = load_line_configs(config)
+        if watch_folder_path:
+            if len(self.line_configs) > 1:
+                raise ValueError("A watch folder override only applies to single-line configs.")
+            self.line_configs[0]["watch_folder_path"] = watch_folder_path
+        self.model_pool = model_pool if model_pool is not None else ModelPool(config.get("model_pool_memory_mb", 1024))
+        self.executor = InferenceExecutor(
+            shutdown_event,
+            batch_size=int(config.get("batch_size", 1)),
+            batch_max_wait=config.get("batch_max_wait_ms", 0) / 1000.0,
+            result_cache_size=config.get("result_cache_size", 1000),
+        )
+
+        # Imported here so the UI can read the line list before the heavy processing imports.
+        from frame_workers import create_frame_worker_pool
+        from processing_manager import ProcessingManager
+        from result_store import create_result_store
+        from metrics import create_pipeline_metrics
+
+        self.frame_workers = create_frame_worker_pool(config, shutdown_event)
+        self.result_store = create_result_store(config)
+        self.metrics = create_pipeline_metrics(config)
+
+        self.managers = {}
+        for line in self.line_configs:
+            self.managers[line["name"]] = ProcessingManager(
+                watch_single_folder_path=line["watch_folder_path"],
+                model_path=line["model_path"] or default_model_path,
+                shutdown_event=shutdown_event,
+                model_pool=self.model_pool,
+                config_path=config_path,
+                inference_executor=self.executor,
+                frame_workers=self.frame_workers,
+                result_store=self.result_store,
+                metrics=self.metrics,
+                line_config=line,
+                **line_callbacks(line["name"]),
+            )
+        logger.info(f"Configured {len(self.managers)} line(s): {list(self.managers)}")
+
+    @property
+    def names(self):
+        return list(self.managers)
+
+    def start_monitoring(self):
+        for manager in self.managers.values():
+            manager.start_monitoring()
+
+    def stop_monitoring(self):
+        for manager in self.managers.values():
+            manager.stop_monitoring()
+        self.executor.stop()
+
+    def request_model_swap(self, model_path):
+        """Swap every line that does not pin its own model in the config."""
+        for line in self.line_configs:
+            if not line["model_path"]:
+                self.managers[line["name"]].request_model_swap(model_path)
+
+    def run(self, display_callbacks=None):
+        """Block until shutdown; display_callbacks maps line names to their display callback (default none)."""
+        display_callbacks = display_callbacks or {}
+        threads = []
+        for name, manager in self.managers.items():
+            # Same model path on several lines: the pool loads it once and the others get a pool hit.
+            thread = threading.Thread(target=manager.process_single_image, args=(display_callbacks.get(name),),
+                                      name=f"line-{name}", daemon=True)
+            thread.start()
+            threads.append(thread)
+
+        self.executor.start()
+        self.metrics.start()
+        for thread in threads:
+            thread.join()
+        self.executor.stop()
+        self.executor.join(timeout=2.0)
+        if self.frame_workers is not None:
+            self.frame_workers.shutdown()
+        if self.result_store is not None:
+            self.result_store.close()
+        self.metrics.stop()
+
+    def get_batch_stats(self):
+        return self.executor.get_batch_stats()
+
+    def get_queue_depths(self):
+        return {name: manager.get_queue_depths() for name, manager in self.managers.items()}
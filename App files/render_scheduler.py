@@ -0,0 +1,88 @@
+from collections import deque
+from threading import Lock
+
+from logger_config import get_logger
+logger = get_logger()
+
+
+class FrameMailbox:
+    """Latest-only hand-off from the processing thread to the Tk thread; older frames are dropped."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.frame = None
+        self.posted_count = 0
+        self.dropped_count = 0
+
+    def post(self, frame):
+        with self.lock:
+            if self.frame is not None:
+                self.dropped_count += 1
+            self.frame = frame
+            self.posted_count += 1
+
+    def take(self):
+        with self.lock:
+            frame, self.frame = self.frame, None
+            return frame
+
+
+class RenderScheduler:
+    """Drains a FrameMailbox from the Tk main loop with after(), redrawing at most max_fps times per second."""
+
+    def __init__(self, widget, mailbox, render_callback, max_fps=15):
+        self.widget = widget
+        self.mailbox = mailbox
+        self.render_callback = render_callback
+        self.interval_ms = max(1, int(1000 / max(1, max_fps)))
+        self.after_id = None
+        self.rendered_count = 0
+
+    def start(self):
+        if self.after_id is None:
+            self.after_id = self.widget.after(self.interval_ms, self.tick)
+
+    def stop(self):
+        if self.after_id is not None:
+            try:
+                self.widget.after_cancel(self.after_id)
+            except Exception:
+                pass
+            self.after_id = None
+
+    def tick(self):
+        try:
+            frame = self.mailbox.take()
+            if frame is not None:
+                self.render_callback(frame)
+                self.rendered_count += 1
+        except Exception:
+            logger.exception("Error rendering frame")
+        finally:
+            self.after_id = self.widget.after(self.interval_ms, self.tick)
+
+
+class UIEventBus:
+    """
+    Worker threads post small (kind, payload) messages; the Tk thread drains them on a timer.
+    deque.append/popleft are atomic, so posting never takes a lock or touches a widget.
+    """
+
+    def __init__(self):
+        self.events = deque()
+
+    def post(self, kind, payload=None):
+        self.events.append((kind, payload))
+
+    def drain(self, max_events=None):
+        pending = len(self.events)
+        if max_events is not None:
+            pending = min(pending, max_events)
+
+        drained = []
+        for _ in range(pending):
+            try:
+                drained.append(self.events.popleft())
+            except IndexError:
+                break
+        return drained
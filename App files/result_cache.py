@@ -0,0 +1,51 @@
+from collections import OrderedDict
+from threading import Lock
+import hashlib
+
+
+def content_hash(buffer):
+    """Fast digest of the raw file bytes; blake2b runs at memory speed on camera-sized JPEGs."""
+    return hashlib.blake2b(buffer, digest_size=16).hexdigest()
+
+
+class ResultCache:
+    """
+    Bounded LRU of classification outputs keyed by (content hash, model identity), so a file that is
+    touched, re-copied or re-saved byte-for-byte is not classified again. Only exact byte matches hit:
+    a re-encoded image is a different input and goes through the model.
+    """
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get_stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,190 @@
+"""
+Durable history of every classified image and pallet in an SQLite database (WAL mode).
+
+record_result / start_pallet / complete_pallet only put a tuple on a queue, so the publish stage
+never waits on disk; one writer thread commits whatever has accumulated as a single transaction
+every flush_interval seconds (or every batch_size rows). Reports read through their own
+connection, which WAL lets run alongside the writer. Times are Unix timestamps (time.time()).
+"""
+
+from queue import Queue, Empty, Full
+import sqlite3
+import threading
+import time
+
+from logger_config import get_logger
+logger = get_logger()
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id          INTEGER PRIMARY KEY,
+    recorded_at REAL NOT NULL,
+    line        TEXT NOT NULL,
+    file        TEXT NOT NULL,
+    status      TEXT,
+    class_name  TEXT,
+    confidence  REAL,
+    model       TEXT,
+    latency_ms  REAL,
+    pallet_id   TEXT,
+    grid_row    INTEGER,
+    grid_col    INTEGER
+);
+CREATE INDEX IF NOT EXISTS results_by_time ON results (recorded_at, line);
+CREATE INDEX IF NOT EXISTS results_by_pallet ON results (pallet_id);
+
+CREATE TABLE IF NOT EXISTS pallets (
+    pallet_id    TEXT PRIMARY KEY,
+    line         TEXT NOT NULL,
+    started_at   REAL NOT NULL,
+    completed_at REAL
+);
+CREATE INDEX IF NOT EXISTS pallets_by_time ON pallets (started_at, line);
+"""
+
+INSERT_RESULT = ("INSERT INTO results (recorded_at, line, file, status, class_name, confidence, model, latency_ms, "
+                 "pallet_id, grid_row, grid_col) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+INSERT_PALLET = "INSERT OR IGNORE INTO pallets (pallet_id, line, started_at) VALUES (?, ?, ?)"
+COMPLETE_PALLET = "UPDATE pallets SET completed_at = ? WHERE pallet_id = ?"
+
+
+def connect(db_path):
+    connection = sqlite3.connect(db_path, timeout=10.0, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    # With WAL, NORMAL only risks the last transactions on power loss, never corruption.
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+def create_result_store(config):
+    """The store at result_store_path, or None when the config disables it (null/empty)."""
+    db_path = config.get("result_store_path")
+    if not db_path:
+        return None
+    return ResultStore(db_path, flush_interval=config.get("result_store_flush_ms", 500) / 1000.0)
+
+
+class ResultStore:
+    def __init__(self, db_path, flush_interval=0.5, batch_size=2000, max_pending=100000):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.pending = Queue(maxsize=max_pending)
+        self.dropped = 0
+        self.written = 0
+        self.keep_running = True
+
+        self.read_connection = connect(db_path)
+        self.read_connection.executescript(SCHEMA)
+        self.read_lock = threading.Lock()
+
+        self.thread = threading.Thread(target=self.run, name="result-store", daemon=True)
+        self.thread.start()
+        logger.info(f"Result store: {db_path}")
+
+    def enqueue(self, statement, row):
+        try:
+            self.pending.put_nowait((statement, row))
+        except Full:
+            # The writer is far behind (disk stalled); losing history beats stalling the line.
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Result store queue full, {self.dropped} rows dropped so far.")
+
+    def record_result(self, line, record, model=None, latency_ms=None, pallet_id=None, position=None):
+        """record is the dict from ProcessingManager.build_result_record."""
+        row, col = position if position is not None else (None, None)
+        self.enqueue(INSERT_RESULT, (time.time(), line, record["image"], record["status"], record["class_name"],
+                                     record["confidence"], model, latency_ms, pallet_id, row, col))
+
+    def start_pallet(self, pallet_id, line):
+        self.enqueue(INSERT_PALLET, (pallet_id, line, time.time()))
+
+    def complete_pallet(self, pallet_id):
+        self.enqueue(COMPLETE_PALLET, (time.time(), pallet_id))
+
+    def next_batch(self):
+        batch = []
+        try:
+            batch.append(self.pending.get(timeout=self.flush_interval))
+        except Empty:
+            return batch
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.pending.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def write(self, connection, batch):
+        # Consecutive rows for the same statement go through one executemany; order is preserved
+        # so a pallet row always exists before its completion update.
+        with connection:
+            start = 0
+            for index in range(1, len(batch) + 1):
+                if index == len(batch) or batch[index][0] != batch[start][0]:
+                    connection.executemany(batch[start][0], [row for _, row in batch[start:index]])
+                    start = index
+        self.written += len(batch)
+
+    def run(self):
+        connection = connect(self.db_path)
+        try:
+            while self.keep_running or not self.pending.empty():
+                batch = self.next_batch()
+                if not batch:
+                    continue
+                try:
+                    self.write(connection, batch)
+                except sqlite3.Error:
+                    logger.exception(f"Failed to write {len(batch)} rows to the result store")
+        finally:
+            connection.close()
+
+    def close(self, timeout=5.0):
+        """Flush what is queued and stop the writer."""
+        self.keep_running = False
+        self.thread.join(timeout)
+        self.read_connection.close()
+
+    def query(self, sql, parameters=()):
+        with self.read_lock:
+            cursor = self.read_connection.execute(sql, parameters)
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def shift_report(self, start, end, line=None):
+        """OK/NOK counts, mean confidence and latency per line for results recorded in [start, end)."""
+        return self.query(
+            "SELECT line, COUNT(*) AS total, "
+            "SUM(status = 'ok') AS ok, SUM(status = 'nok') AS nok, SUM(status IS NULL) AS unknown, "
+            "AVG(confidence) AS mean_confidence, AVG(latency_ms) AS mean_latency_ms, "
+            "COUNT(DISTINCT pallet_id) AS pallets "
+            "FROM results WHERE recorded_at >= ? AND recorded_at < ? AND (? IS NULL OR line = ?) "
+            "GROUP BY line ORDER BY line",
+            (start, end, line, line))
+
+    def pallets(self, start, end, line=None):
+        """Pallets started in [start, end) with their counts; completed_at is None for unfinished ones."""
+        return self.query(
+            "SELECT p.pallet_id, p.line, p.started_at, p.completed_at, COUNT(r.id) AS count, "
+            "SUM(r.status = 'ok') AS ok, SUM(r.status = 'nok') AS nok "
+            "FROM pallets p LEFT JOIN results r ON r.pallet_id = p.pallet_id "
+            "WHERE p.started_at >= ? AND p.started_at < ? AND (? IS NULL OR p.line = ?) "
+            "GROUP BY p.pallet_id ORDER BY p.started_at",
+            (start, end, line, line))
+
+    def pallet_results(self, pallet_id):
+        """Every image on one pallet in placement order, with its grid cell."""
+        return self.query(
+            "SELECT recorded_at, file, status, class_name, confidence, model, latency_ms, grid_row, grid_col "
+            "FROM results WHERE pallet_id = ? ORDER BY id",
+            (pallet_id,))
+
+    def get_stats(self):
+        return {"written": self.written, "pending": self.pending.qsize(), "dropped": self.dropped}
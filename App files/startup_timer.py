@@ -0,0 +1,51 @@
+from contextlib import contextmanager
+from threading import Lock
+import time
+
+from logger_config import get_logger
+logger = get_logger()
+
+
+class StartupTimer:
+    """Records how long each startup phase took; every phase is recorded once, the first time it happens."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases = {}
+        self.lock = Lock()
+        self.summary_logged = False
+
+    def record(self, phase, duration_ms):
+        with self.lock:
+            if phase in self.phases:
+                return
+            self.phases[phase] = duration_ms
+        logger.info(f"Startup phase '{phase}': {duration_ms:.0f} ms "
+                    f"(t+{(time.perf_counter() - self.started_at) * 1000.0:.0f} ms)")
+
+    def mark(self, phase):
+        """Record a phase that started when the process did."""
+        self.record(phase, (time.perf_counter() - self.started_at) * 1000.0)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000.0)
+
+    def log_summary(self):
+        with self.lock:
+            if self.summary_logged:
+                return
+            self.summary_logged = True
+            phases = ", ".join(f"{name} {ms:.0f} ms" for name, ms in self.phases.items())
+        logger.info(f"Startup complete after {(time.perf_counter() - self.started_at) * 1000.0:.0f} ms: {phases}")
+
+
+startup_timer = StartupTimer()
+
+
+def get_startup_timer():
+    return startup_timer
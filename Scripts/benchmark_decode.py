@@ -0,0 +1,81 @@
+"""
+Decode throughput benchmark for the app's decode stage.
+- Feeds the sample images through the real PipelineStage used by ProcessingManager.
+- Repeats the run with 1, 2 and 4 decode workers.
+- Prints images/s for each worker count.
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent / "App files"
+sys.path.insert(0, str(APP_DIR))
+
+from image_io import decode_frame, IMAGE_EXTENSIONS
+from pipeline import Pipeline, PipelineStage
+
+
+# ==============================
+# USER CONFIGURABLE PARAMETERS
+# ==============================
+IMAGES_PATH    = APP_DIR / "destination_images" / "single_folder"
+WORKER_COUNTS  = [1, 2, 4]
+REPEATS        = 3       # passes over the folder per worker count
+QUEUE_SIZE     = 120
+TIMEOUT_S      = 300     # per worker count; an image that fails to decode never reaches the sink
+
+
+def run_decode(image_paths, workers):
+    shutdown_event = threading.Event()
+    done = threading.Event()
+    total = len(image_paths) * REPEATS
+    decoded = [0]
+    last_decoded = [0.0]
+
+    def sink(item):
+        decoded[0] += 1
+        last_decoded[0] = time.perf_counter()
+        if decoded[0] == total:
+            done.set()
+
+    pipeline = Pipeline([
+        PipelineStage("decode", lambda path: decode_frame(path), shutdown_event, maxsize=QUEUE_SIZE, workers=workers),
+        PipelineStage("sink", sink, shutdown_event, maxsize=QUEUE_SIZE),
+    ])
+    pipeline.start()
+
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        for path in image_paths:
+            pipeline.head.put(str(path))
+    finished = done.wait(TIMEOUT_S)
+    elapsed = max(last_decoded[0] - start, 1e-9)
+
+    shutdown_event.set()
+    pipeline.join(timeout=2.0)
+    if not finished:
+        print(f"workers={workers}: timed out after {TIMEOUT_S} s with {decoded[0]} of {total} images decoded")
+    return decoded[0] / elapsed
+
+
+def main():
+    image_paths = sorted(p for p in IMAGES_PATH.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+    if not image_paths:
+        raise FileNotFoundError(f"No images found in {IMAGES_PATH}")
+
+    # Warm the OS file cache so the first run is not penalised by disk reads.
+    for path in image_paths:
+        path.read_bytes()
+
+    print(f"Decoding {len(image_paths)} images x {REPEATS} passes")
+    baseline = None
+    for workers in WORKER_COUNTS:
+        rate = run_decode(image_paths, workers)
+        baseline = baseline or rate
+        print(f"workers={workers}: {rate:7.1f} images/s  ({rate / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
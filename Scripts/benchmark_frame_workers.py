@@ -0,0 +1,100 @@
+"""
+Throughput of the live pipeline with decode/annotation in threads vs. in worker processes.
+- Builds a real ProcessingManager (decode -> inference -> annotate -> publish) from config.json,
+  once per entry in PROCESS_COUNTS (0 = the threaded path, N = frame_worker_processes N).
+- Feeds the sample images through the pipeline head REPEATS times, rendering the display image
+  like the UI does, with the result cache off so every pass is classified again.
+- Prints images/s per setting and the speedup over the threaded path. Run it on the production
+  PC: worker processes only pay off with spare cores next to the inference thread.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent / "App files"
+sys.path.insert(0, str(APP_DIR))
+
+from image_io import IMAGE_EXTENSIONS
+from processing_manager import ProcessingManager
+
+
+# ==============================
+# USER CONFIGURABLE PARAMETERS
+# ==============================
+MODEL_PATH     = Path(r"path")  # classifier used by the app
+IMAGES_PATH    = APP_DIR / "destination_images" / "single_folder"
+CONFIG_PATH    = APP_DIR / "config.json"
+PROCESS_COUNTS = [0, 2, 4]
+REPEATS        = 3       # passes over the folder per setting
+TIMEOUT_S      = 600     # per setting; an image dropped before publish (e.g. deleted mid-run) never arrives
+
+
+def run_pipeline(config, image_paths, processes, work_dir):
+    config = dict(config, frame_worker_processes=processes, result_cache_size=0, save_annotated=False,
+                  processed_index_path=os.path.join(work_dir, f"index_{processes}.txt"))
+    config_path = os.path.join(work_dir, f"config_{processes}.json")
+    with open(config_path, "w") as f:
+        json.dump(config, f)
+
+    total = len(image_paths) * REPEATS
+    published = [0]
+    last_published = [0.0]
+    done = threading.Event()
+
+    def on_result(record):
+        published[0] += 1
+        last_published[0] = time.perf_counter()
+        if published[0] == total:
+            done.set()
+
+    shutdown_event = threading.Event()
+    manager = ProcessingManager(model_path=str(MODEL_PATH), shutdown_event=shutdown_event,
+                                update_grid_callback=lambda message: None, result_callback=on_result,
+                                config_path=config_path)
+    worker = threading.Thread(target=manager.process_single_image, args=(lambda image: None,), daemon=True)
+    worker.start()
+    while manager.model is None and worker.is_alive():
+        time.sleep(0.05)
+
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        for path in image_paths:
+            manager.pipeline.head.put(str(path))
+    finished = done.wait(TIMEOUT_S)
+    elapsed = max(last_published[0] - start, 1e-9)
+
+    shutdown_event.set()
+    worker.join(timeout=10.0)
+    if not finished:
+        print(f"processes={processes}: timed out after {TIMEOUT_S} s with {published[0]} of {total} images published")
+    return published[0] / elapsed
+
+
+def main():
+    with open(CONFIG_PATH, "r") as f:
+        config = json.load(f)
+
+    image_paths = sorted(p for p in IMAGES_PATH.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+    if not image_paths:
+        raise FileNotFoundError(f"No images found in {IMAGES_PATH}")
+    for path in image_paths:
+        path.read_bytes()
+
+    print(f"{len(image_paths)} images x {REPEATS} passes on {os.cpu_count()} CPUs, "
+          f"annotation_mode={config.get('annotation_mode', 'full')}")
+    baseline = None
+    with tempfile.TemporaryDirectory() as work_dir:
+        for processes in PROCESS_COUNTS:
+            rate = run_pipeline(config, image_paths, processes, work_dir)
+            baseline = baseline or rate
+            label = "threads" if processes == 0 else f"processes={processes}"
+            print(f"{label:>13}: {rate:7.1f} images/s  ({rate / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Logging overhead per image on the pipeline threads.
+- Emits the per-image log lines of the live app (event detected, queued, processing, status,
+  grid update, displaying, displayed) for IMAGES images under each logging setup below.
+- "before" is the original setup: synchronous colorized console sink, every line logged.
+- Reports the time the calling thread spends per image. Queued records are drained between runs
+  and that time is not counted, because it is spent on loguru's thread.
+- Run it from a real console: terminal output is what makes the synchronous sink expensive. The
+  slow-console runs add SLOW_CONSOLE_MS per write to show what a stalled console costs each way.
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent / "App files"
+sys.path.insert(0, str(APP_DIR))
+
+from logger_config import configure_logging, get_image_logger, get_logger
+
+logger = get_logger()
+image_logger = get_image_logger()
+
+
+# ==============================
+# USER CONFIGURABLE PARAMETERS
+# ==============================
+IMAGES = 2000
+SLOW_CONSOLE_MS = 1.0   # per write, like a busy Windows console; 0 skips the slow-console runs
+
+
+class SlowConsole:
+    def __init__(self, stream, delay):
+        self.stream = stream
+        self.delay = delay
+
+    def write(self, text):
+        time.sleep(self.delay)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def log_image(index):
+    path = f"./destination_images/single_folder/Pic_{index:06d}.jpg"
+    image_logger.info("Image event detected: {}", path)
+    image_logger.info("Image queued for processing: {}", path)
+    image_logger.info("Processing image: {}", os.path.basename(path))
+    image_logger.info("Processed image status: {}", "ok")
+    image_logger.info("Received grid update message for {}: {}", "line_1", "update_cell")
+    image_logger.info("Displaying image on canvas...")
+    image_logger.info("Displayed processed image.")
+
+
+def run(label, settings, console=None):
+    configure_logging({"logging": settings}, console=console or sys.stderr)
+    start = time.perf_counter()
+    for index in range(IMAGES):
+        log_image(index)
+    elapsed = time.perf_counter() - start
+    logger.complete()
+    return label, elapsed / IMAGES * 1e6
+
+
+def main():
+    with tempfile.TemporaryDirectory() as work_dir:
+        json_file = os.path.join(work_dir, "inspection.jsonl")
+        setups = [
+            ("before: sync console, every line", {"async": False, "image_log_every": 1}),
+            ("async console, every line", {"async": True, "image_log_every": 1}),
+            ("async console + JSON file, every line", {"async": True, "image_log_every": 1, "json_file": json_file}),
+            ("async console + JSON file, 1 in 20", {"async": True, "image_log_every": 20, "json_file": json_file}),
+            ("per-image lines off", {"async": True, "image_log_every": 0, "json_file": json_file}),
+        ]
+        results = [run(label, settings) for label, settings in setups]
+        if SLOW_CONSOLE_MS:
+            slow = SlowConsole(sys.stderr, SLOW_CONSOLE_MS / 1000.0)
+            results.append(run("slow console: sync, every line", {"async": False, "image_log_every": 1}, slow))
+            results.append(run("slow console: async, every line", {"async": True, "image_log_every": 1}, slow))
+        configure_logging({"logging": {"async": False}}, console=sys.stderr)
+
+    baseline = results[0][1]
+    print(f"\nCaller time per image ({IMAGES} images, 7 log lines each):")
+    for label, per_image in results:
+        print(f"{label:>40}: {per_image:8.1f} us  ({per_image / baseline:.2f}x of before)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Offline end-to-end benchmark of the live inspection path.
+- Builds a tiny, randomly initialised (seeded) YOLO classifier from the yaml that ships with
+  ultralytics, so nothing is downloaded and results do not depend on trained weights.
+- Runs the real path headless: watchdog observer -> ImageHandler -> ProcessingManager pipeline
+  (decode -> inference -> annotate -> publish), using config.json with its paths redirected to a temp folder.
+- Copies the sample images (REPEATS times, under new names) into the watched folder in one burst, the
+  way a camera backlog arrives, and waits until every image is published.
+- Reports images/s, per-stage and end-to-end p50/p95/p99 latency (from PipelineMetrics) and writes
+  them as JSON. With --baseline it compares against an earlier result file and exits 1 on a regression.
+
+    python benchmark_pipeline.py --output results/bench_<commit>.json [--baseline results/bench_main.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent / "App files"
+sys.path.insert(0, str(APP_DIR))
+
+from image_io import IMAGE_EXTENSIONS
+from logger_config import configure_logging
+
+
+# ==============================
+# USER CONFIGURABLE PARAMETERS
+# ==============================
+IMAGES_PATH    = APP_DIR / "destination_images" / "single_folder"
+CONFIG_PATH    = APP_DIR / "config.json"
+MODEL_YAML     = "yolov8n-cls.yaml"
+IMGSZ          = 224
+REPEATS        = 2        # passes over the sample folder
+TIMEOUT_S      = 600
+TOLERANCE      = 0.10     # allowed relative loss in images/s or rise in end-to-end p95 before --baseline fails
+
+
+def build_tiny_classifier(path, imgsz=IMGSZ, seed=0, calibration_paths=None):
+    """
+    A 2-class (nok/ok) classifier with random weights, saved as an ultralytics checkpoint.
+    Freshly initialised, its activations vanish and every image gets the same output. With
+    calibration_paths (sample images), BatchNorm statistics are estimated on them and the output bias is
+    centred so about half of them come out "ok": the output then depends on the input, as parity checks need.
+    """
+    import torch
+    from ultralytics.nn.tasks import ClassificationModel
+
+    torch.manual_seed(seed)
+    model = ClassificationModel(MODEL_YAML, nc=2, verbose=False)
+    model.names = {0: "nok", 1: "ok"}
+    model.args = {"imgsz": imgsz, "task": "classify"}
+    if calibration_paths:
+        calibrate_classifier(model, calibration_paths, imgsz)
+    model.eval()
+    torch.save({"model": model, "train_args": {"imgsz": imgsz, "task": "classify"}, "date": None, "version": "8"}, path)
+    return path
+
+
+def calibrate_classifier(model, image_paths, imgsz, batch_size=16):
+    import cv2
+    import numpy as np
+    import torch
+
+    def batches():
+        for start in range(0, len(image_paths), batch_size):
+            frames = [cv2.resize(cv2.imread(str(p)), (imgsz, imgsz), interpolation=cv2.INTER_AREA)
+                      for p in image_paths[start:start + batch_size]]
+            yield torch.from_numpy(np.stack(frames)[..., ::-1].copy()).permute(0, 3, 1, 2).float() / 255.0
+
+    for module in model.modules():
+        if isinstance(module, torch.nn.BatchNorm2d):
+            module.reset_running_stats()
+            module.momentum = None  # cumulative average over every calibration batch
+    with torch.no_grad():
+        model.train()
+        for batch in batches():
+            model(batch)
+        model.eval()
+        logits = []
+        head = model.model[-1].linear
+        hook = head.register_forward_hook(lambda module, inputs, output: logits.append(output))
+        for batch in batches():
+            model(batch)
+        hook.remove()
+        margins = torch.cat(logits)
+        head.bias[0] -= torch.median(margins[:, 0] - margins[:, 1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, capture_output=True, text=True,
+                              timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmark(config, image_paths, work_dir, model_path, repeats, render):
+    from processing_manager import ProcessingManager
+
+    watch_dir = os.path.join(work_dir, "watch")
+    os.makedirs(watch_dir)
+    config = dict(config,
+                  watch_single_folder_path=watch_dir,
+                  processed_index_path=os.path.join(work_dir, "processed_index.txt"),
+                  result_store_path=os.path.join(work_dir, "results.db"),
+                  annotated_output_path=os.path.join(work_dir, "annotated"),
+                  metrics_port=None, metrics_log_interval_s=0)
+    config_path = os.path.join(work_dir, "config.json")
+    with open(config_path, "w") as f:
+        json.dump(config, f)
+
+    total = len(image_paths) * repeats
+    published = [0]
+    done = threading.Event()
+
+    def on_result(record):
+        published[0] += 1
+        if published[0] >= total:
+            done.set()
+
+    shutdown_event = threading.Event()
+    manager = ProcessingManager(watch_single_folder_path=watch_dir, model_path=model_path, shutdown_event=shutdown_event,
+                                update_grid_callback=lambda message: None, result_callback=on_result,
+                                config_path=config_path)
+    display = (lambda image: None) if render else None
+    worker = threading.Thread(target=manager.process_single_image, args=(display,), daemon=True)
+    worker.start()
+    while manager.model is None and worker.is_alive():
+        time.sleep(0.05)
+    manager.start_monitoring()
+    time.sleep(0.5)  # let the observer settle on the empty folder
+
+    start = time.perf_counter()
+    for repeat in range(repeats):
+        for path in image_paths:
+            shutil.copyfile(path, os.path.join(watch_dir, f"{path.stem}_r{repeat}{path.suffix}"))
+    copied = time.perf_counter() - start
+    finished = done.wait(TIMEOUT_S)
+    elapsed = time.perf_counter() - start
+
+    snapshot = manager.metrics.snapshot()
+    batch_stats = manager.get_batch_stats()
+    manager.stop_monitoring()
+    shutdown_event.set()
+    worker.join(timeout=10.0)
+
+    latency = snapshot["latency_ms"].get(manager.line_name, {})
+    return {
+        "completed": finished,
+        "images": published[0],
+        "expected": total,
+        "copy_s": round(copied, 3),
+        "elapsed_s": round(elapsed, 3),
+        "images_per_s": round(published[0] / elapsed, 2),
+        "end_to_end_ms": latency.pop("total", {}),
+        "stage_ms": latency,
+        "drops": snapshot["drops"],
+        "batch_sizes": batch_stats["histogram"],
+    }
+
+
+def compare(result, baseline, tolerance):
+    """Regression messages for throughput and end-to-end p95 against a baseline result."""
+    failures = []
+    old_rate, new_rate = baseline["result"]["images_per_s"], result["result"]["images_per_s"]
+    print(f"images/s: {old_rate} -> {new_rate} ({(new_rate - old_rate) / old_rate:+.1%})")
+    if new_rate < old_rate * (1 - tolerance):
+        failures.append(f"throughput dropped from {old_rate} to {new_rate} images/s")
+
+    old_p95 = baseline["result"]["end_to_end_ms"].get("p95")
+    new_p95 = result["result"]["end_to_end_ms"].get("p95")
+    if old_p95 and new_p95:
+        print(f"end-to-end p95: {old_p95:.0f} -> {new_p95:.0f} ms ({(new_p95 - old_p95) / old_p95:+.1%})")
+        if new_p95 > old_p95 * (1 + tolerance):
+            failures.append(f"end-to-end p95 rose from {old_p95:.0f} to {new_p95:.0f} ms")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark with a tiny random classifier.")
+    parser.add_argument("--output", default="benchmark_pipeline.json", help="where to write the JSON result")
+    parser.add_argument("--baseline", default=None, help="earlier result to compare against (exit 1 on regression)")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--no-render", action="store_true", help="skip display rendering, like the headless service")
+    parser.add_argument("--keep-cache", action="store_true", help="leave the result cache on (repeats become hits)")
+    args = parser.parse_args(argv)
+
+    with open(CONFIG_PATH, "r") as f:
+        config = json.load(f)
+    if not args.keep_cache:
+        config["result_cache_size"] = 0
+    configure_logging(config)
+
+    image_paths = sorted(p for p in IMAGES_PATH.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+    if not image_paths:
+        raise FileNotFoundError(f"No images found in {IMAGES_PATH}")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        model_path = build_tiny_classifier(os.path.join(work_dir, "tiny_cls.pt"))
+        result = run_benchmark(config, image_paths, work_dir, model_path, args.repeats, not args.no_render)
+
+    report = {
+        "commit": git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"platform": platform.platform(), "processor": platform.processor(), "cpus": os.cpu_count(),
+                    "python": platform.python_version()},
+        "settings": {key: config.get(key) for key in (
+            "inference_backend", "batch_size", "batch_max_wait_ms", "decode_workers", "frame_worker_processes",
+            "annotation_mode", "result_cache_size")} | {"render": not args.no_render, "model": MODEL_YAML,
+                                                         "imgsz": IMGSZ, "repeats": args.repeats},
+        "result": result,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    end_to_end = result["end_to_end_ms"]
+    print(f"\n{result['images']}/{result['expected']} images in {result['elapsed_s']} s: "
+          f"{result['images_per_s']} images/s")
+    if end_to_end:
+        print(f"end-to-end p50/p95/p99: {end_to_end['p50']:.0f}/{end_to_end['p95']:.0f}/{end_to_end['p99']:.0f} ms")
+    for stage, stats in result["stage_ms"].items():
+        print(f"  {stage:>9}: p50 {stats['p50']:8.1f}  p95 {stats['p95']:8.1f}  p99 {stats['p99']:8.1f} ms")
+    print(f"drops: {result['drops'] or 'none'}, batch sizes: {result['batch_sizes']}")
+    print(f"Results written to {args.output}")
+
+    if not result["completed"]:
+        print(f"Timed out after {TIMEOUT_S} s with {result['images']} of {result['expected']} images published.")
+        sys.exit(1)
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            failures = compare(report, json.load(f), TOLERANCE)
+        if failures:
+            print("Regression: " + "; ".join(failures))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
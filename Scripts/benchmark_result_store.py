@@ -0,0 +1,76 @@
+"""
+Cost of the result store on the publish stage.
+- Calls ResultStore.record_result at TARGET_RATE rows/s for DURATION_S seconds, paced like a busy line.
+- Reports the per-call latency seen by the caller (that is all the hot path pays) and how far
+  the background writer lags behind (rows still queued when the load stops, time to drain them).
+- Finishes with the shift and pallet report queries against the rows just written.
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+APP_DIR = Path(__file__).resolve().parent.parent / "App files"
+sys.path.insert(0, str(APP_DIR))
+
+from result_store import ResultStore
+
+
+# ==============================
+# USER CONFIGURABLE PARAMETERS
+# ==============================
+TARGET_RATE    = 10000   # rows/s
+DURATION_S     = 5
+PALLET_SIZE    = 112
+
+
+def main():
+    with tempfile.TemporaryDirectory() as work_dir:
+        store = ResultStore(os.path.join(work_dir, "results.db"))
+        record = {"image": "Pic_0000.jpg", "status": "ok", "class_name": "ok", "confidence": 0.98731}
+        total = TARGET_RATE * DURATION_S
+        call_us = np.empty(total)
+
+        start = time.perf_counter()
+        pallet_id = None
+        for index in range(total):
+            # Pace in small bursts; sleeping per row would be coarser than the 100 us budget.
+            if index % 100 == 0:
+                delay = start + index / TARGET_RATE - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            if index % PALLET_SIZE == 0:
+                pallet_id = f"bench-{index // PALLET_SIZE}"
+                store.start_pallet(pallet_id, "bench")
+            t0 = time.perf_counter()
+            store.record_result("bench", record, "best.pt", 42.0, pallet_id, (index % 14, index % 8))
+            call_us[index] = (time.perf_counter() - t0) * 1e6
+        elapsed = time.perf_counter() - start
+
+        backlog = store.get_stats()["pending"]
+        drain_start = time.perf_counter()
+        store.close(timeout=60.0)
+        drain_ms = (time.perf_counter() - drain_start) * 1000.0
+
+        print(f"{total} rows in {elapsed:.2f} s ({total / elapsed:.0f} rows/s offered)")
+        print(f"record_result per call: p50 {np.percentile(call_us, 50):.1f} us, "
+              f"p99 {np.percentile(call_us, 99):.1f} us, max {call_us.max():.0f} us")
+        print(f"writer backlog at end of load: {backlog} rows, drained in {drain_ms:.0f} ms, "
+              f"written {store.written}, dropped {store.dropped}")
+
+        store = ResultStore(os.path.join(work_dir, "results.db"))
+        t0 = time.perf_counter()
+        report = store.shift_report(0, time.time() + 1)
+        pallets = store.pallets(0, time.time() + 1)
+        cells = store.pallet_results(pallets[-1]["pallet_id"])
+        print(f"shift report + {len(pallets)} pallets + last pallet ({len(cells)} cells) "
+              f"in {(time.perf_counter() - t0) * 1000.0:.1f} ms: {report}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Side-by-side comparison of the app's inference backends.
+- Loads the same classifier through every backend in BACKENDS (the .pt is exported to ONNX on first use).
+  Without --model it uses the seeded tiny classifier from benchmark_pipeline, calibrated on the sample
+  images so its output depends on the input; a trained model (--model) is the real acceptance test.
+- Runs each backend over the sample images, one full-resolution decode_frame per call, i.e. the frame the
+  live pipeline hands the model at batch size 1.
+- Reports per-image latency (mean/p50/p95), top-1 / OK-NOK agreement and the per-image probability
+  difference (max |p - p_reference| over the classes; p50/max, and the worst images) against the reference
+  backend. --deltas writes the per-image differences as CSV.
+- Doubles as the parity check: exits non-zero if any backend makes a different OK/NOK decision than the
+  reference on any sample image, or if the reference output barely changes across the images (a model
+  that answers the same for everything proves nothing about parity).
+
+    python compare_backends.py [--model path/to/classifier.pt] [--images folder]
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+APP_DIR = Path(__file__).resolve().parent.parent / "App files"
+sys.path.insert(0, str(APP_DIR))
+
+from image_io import decode_frame, IMAGE_EXTENSIONS
+from inference_backends import create_inference_backend, build_status_table
+from benchmark_pipeline import build_tiny_classifier
+
+
+# ==============================
+# USER CONFIGURABLE PARAMETERS
+# ==============================
+IMAGES_PATH  = APP_DIR / "destination_images" / "single_folder"
+CONFIG_PATH  = APP_DIR / "config.json"
+BACKENDS     = ["ultralytics", "opencv_dnn", "torch"]  # the first one is the reference
+WARMUP_RUNS  = 3
+MIN_PROB_SPREAD = 1e-3  # the reference "ok"/"nok" probabilities must vary at least this much across images
+
+
+def run_backend(backend, frames):
+    for frame in frames[:WARMUP_RUNS]:
+        backend.classify([frame])
+
+    all_probs, latencies = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        all_probs.append(np.asarray(backend.classify([frame])[0], dtype=np.float64))
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return np.array(all_probs), np.array(latencies)
+
+
+def compare(model_path, config, image_paths, deltas_path=None):
+    """Run every backend and print its line; returns [(backend, mismatched file names)]."""
+    frames = [decode_frame(str(p)) for p in image_paths]
+    print(f"Comparing {BACKENDS} with {model_path} on {len(frames)} images\n")
+
+    reference = None
+    parity_failures = []
+    deltas = {}
+    for name in BACKENDS:
+        backend = create_inference_backend(str(model_path), config["prediction_parameters"], name)
+        probs, latencies = run_backend(backend, frames)
+        top1 = probs.argmax(axis=1)
+        status_table = build_status_table(backend.names, config["status_logic"])
+        statuses = np.array([status_table[c] for c in top1])
+
+        line = (f"{name:<12} mean {latencies.mean():7.2f} ms | p50 {np.percentile(latencies, 50):7.2f} ms | "
+                f"p95 {np.percentile(latencies, 95):7.2f} ms | {1000.0 / latencies.mean():6.1f} images/s")
+        if reference is None:
+            reference = (top1, statuses, probs)
+            spread = np.ptp(probs, axis=0).max()
+            if spread < MIN_PROB_SPREAD:
+                print(line)
+                print(f"\nThe {name} output hardly depends on the input (probabilities vary by {spread:.2g} across "
+                      f"{len(frames)} images); parity cannot be judged with this model.")
+                sys.exit(1)
+        else:
+            delta = np.abs(probs - reference[2]).max(axis=1)
+            deltas[name] = delta
+            line += (f" | top-1 agreement {np.mean(top1 == reference[0]):.2%}"
+                     f" | OK/NOK agreement {np.mean(statuses == reference[1]):.2%}"
+                     f" | prob delta p50 {np.median(delta):.2e} max {delta.max():.2e}")
+            mismatches = [p.name for p, same in zip(image_paths, statuses == reference[1]) if not same]
+            if mismatches:
+                parity_failures.append((name, mismatches))
+        print(line)
+
+    for name, delta in deltas.items():
+        worst = np.argsort(delta)[::-1][:3]
+        print(f"{name:<12} largest prob deltas: " + ", ".join(f"{image_paths[i].name} {delta[i]:.2e}" for i in worst))
+    if deltas_path:
+        with open(deltas_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["image", *deltas])
+            for index, path in enumerate(image_paths):
+                writer.writerow([path.name, *(f"{delta[index]:.6g}" for delta in deltas.values())])
+        print(f"Per-image prob deltas written to {deltas_path}")
+    return parity_failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the inference backends' latency and OK/NOK decisions.")
+    parser.add_argument("--model", default=None, help=".pt classifier (default: a seeded tiny calibrated classifier)")
+    parser.add_argument("--images", default=str(IMAGES_PATH), help="folder of sample images")
+    parser.add_argument("--deltas", default=None, help="write per-image prob deltas against the reference as CSV")
+    args = parser.parse_args(argv)
+
+    with open(CONFIG_PATH, "r") as f:
+        config = json.load(f)
+
+    images = Path(args.images)
+    image_paths = sorted(p for p in images.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+    if not image_paths:
+        raise FileNotFoundError(f"No images found in {images}")
+
+    if args.model:
+        parity_failures = compare(args.model, config, image_paths, args.deltas)
+    else:
+        with tempfile.TemporaryDirectory() as work_dir:
+            model_path = build_tiny_classifier(os.path.join(work_dir, "tiny_cls.pt"), calibration_paths=image_paths)
+            parity_failures = compare(model_path, config, image_paths, args.deltas)
+
+    for name, mismatches in parity_failures:
+        print(f"\nPARITY FAILED: {name} disagrees with {BACKENDS[0]} on {len(mismatches)} image(s): {mismatches[:10]}")
+    if parity_failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,35 @@
-
 """
 Unified inference script for YOLOv8/YOLOv11 (detection or classification).
 - Accepts a single model (.pt) or a folder of multiple models.
 - Accepts a folder of images or a single image file.
-- Runs inference, counts OK vs NOK predictions.
-- Optional: save annotated results for inspection.
+- Decodes every image once, in batches prefetched by background threads, and runs each batch
+  through every model.
+- Counts OK vs NOK predictions and reports images/s per model (model time only, decoding is shared).
+- Optional: save annotated results for inspection. Nothing is written to disk otherwise.
+- WORKERS > 0 (for large archives): shards the folder across worker processes, each with its own
+  model copies and TORCH_THREADS. Each worker appends one line per image to its manifest file
+  (file name, then one label per model) as batches finish. Images already in the manifests are skipped,
+  so an interrupted run just resumes. Memory stays flat: file names are streamed from the folder, and
+  the resume set is a sorted uint64 array of name hashes (8 bytes per image).
 """
 
+import hashlib
+import multiprocessing
 import os
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
+from queue import Queue
+from threading import Thread
+
+import cv2  # also an ultralytics dependency
+import numpy as np
 from ultralytics import YOLO
 import logging
 logging.getLogger('ultralytics').setLevel(logging.ERROR)
 
 
-
-
-try:
-    import cv2
-except ImportError:
-    cv2 = None  # only needed if save_viz=True
-
-
 # ==============================
 # USER CONFIGURABLE PARAMETERS
 # ==============================
@@ -31,6 +39,12 @@ CONF         = 0.4
 IOU          = 0.7
 SAVE_VIZ     = False
 OUTPUT_ROOT  = Path("inference_results")
+BATCH_SIZE       = 16  # images per predict call
+PREFETCH_BATCHES = 2   # decoded batches kept ready while the models run
+DECODE_THREADS   = 4
+WORKERS          = 0     # >0: sharded, resumable run over that many processes
+TORCH_THREADS    = 0     # torch threads per worker; 0 = CPU count / WORKERS
+MANIFEST_DIR     = OUTPUT_ROOT / "manifest"
 
 
 IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"}
@@ -43,80 +57,260 @@ def iter_images(path: Path):
         else:
             raise ValueError(f"Unsupported image format: {path}")
     elif path.is_dir():
-        for p in path.iterdir():
-            if p.suffix.lower() in IMAGE_EXTS:
-                yield p
+        # scandir streams the entries; nothing proportional to the folder size is held.
+        with os.scandir(path) as it:
+            for entry in it:
+                if os.path.splitext(entry.name)[1].lower() in IMAGE_EXTS:
+                    yield Path(entry.path)
     else:
         raise FileNotFoundError(f"Invalid images path: {path}")
 
-def run_inference(model_path: Path, images_path: Path):
 
+def iter_batches(image_files, batch_size=BATCH_SIZE, prefetch=PREFETCH_BATCHES, threads=DECODE_THREADS):
+    """
+    Yields (files, BGR frames) batches. A background thread decodes ahead (cv2 releases the GIL), at most
+    `prefetch` batches, so memory stays bounded however many images there are. Unreadable files are skipped.
+    """
+    ready = Queue(maxsize=prefetch)
+
+    def produce():
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            batch = []
+            for img_file in image_files:
+                batch.append(img_file)
+                if len(batch) == batch_size:
+                    ready.put((batch, list(pool.map(lambda p: cv2.imread(str(p)), batch))))
+                    batch = []
+            if batch:
+                ready.put((batch, list(pool.map(lambda p: cv2.imread(str(p)), batch))))
+        ready.put(None)
+
+    Thread(target=produce, daemon=True).start()
+    while (item := ready.get()) is not None:
+        files, frames = [], []
+        for img_file, frame in zip(*item):
+            if frame is None:
+                print(f"Skipping unreadable image: {img_file}")
+            else:
+                files.append(img_file)
+                frames.append(frame)
+        if files:
+            yield files, frames
+
+
+def load_model(model_path: Path):
     model = YOLO(str(model_path))  # task auto-detected from checkpoint
     task = getattr(model, "task", "classify")
+    if task not in ("detect", "classify"):
+        raise ValueError(f"Unsupported YOLO task: {task}")
+    names = model.names if isinstance(model.names, dict) else {i: n for i, n in enumerate(model.names)}
+    return model, task, names
 
-    ok_count, nok_count = 0, 0
-    out_dir = OUTPUT_ROOT / model_path.stem
-    if SAVE_VIZ:
-        out_dir.mkdir(parents=True, exist_ok=True)
-
-    for img_file in iter_images(images_path):
-        results = model.predict(
-            str(img_file),
-            conf=CONF,
-            iou=IOU,
-            save=True,
-            verbose=False
-        )
-        r = results[0]
-
-        names = model.names if isinstance(model.names, dict) else {i: n for i, n in enumerate(model.names)}
-
-        if task == "detect":
-            cls_names = [names[int(b.cls)].lower() for b in (r.boxes or [])]
-            if not cls_names or any("nok" in c for c in cls_names):
-                nok_count += 1
-                pred_label = "NOK"
-            else:
-                ok_count += 1
-                pred_label = "OK"
 
-            if SAVE_VIZ:
-                if cv2 is None:
-                    raise RuntimeError("OpenCV (cv2) required for save_viz=True")
-                img = r.plot()
-                cv2.imwrite(str(out_dir / f"{img_file.stem}__{pred_label}.png"), img)
-
-        elif task == "classify":
-            if r.probs is None or r.probs.top1 is None:
-                top_name, top_score = "bad", 0.0
-            else:
-                top_idx = int(r.probs.top1)
-                top_name = names.get(top_idx, str(top_idx)).lower()
-                top_score = float(r.probs.data[top_idx].item())
-
-            if "bad" in top_name.lower(): 
-                nok_count += 1
-                pred_label = f"NOK_{top_score:.2f}"
-                is_ok = False
-            else:
-                ok_count += 1
-                pred_label = f"OK_{top_score:.2f}"
-                is_ok = True
+def label_result(r, task, names):
+    """(is_ok, pred_label) for one ultralytics result."""
+    if task == "detect":
+        cls_names = [names[int(b.cls)].lower() for b in (r.boxes or [])]
+        if not cls_names or any("nok" in c for c in cls_names):
+            return False, "NOK"
+        return True, "OK"
+
+    if r.probs is None or r.probs.top1 is None:
+        top_name, top_score = "bad", 0.0
+    else:
+        top_idx = int(r.probs.top1)
+        top_name = names.get(top_idx, str(top_idx)).lower()
+        top_score = float(r.probs.data[top_idx].item())
+
+    if "bad" in top_name.lower():
+        return False, f"NOK_{top_score:.2f}"
+    return True, f"OK_{top_score:.2f}"
+
+
+def save_viz(r, task, out_dir: Path, img_file: Path, is_ok, pred_label):
+    if task == "detect":
+        img = r.plot()
+    else:
+        img = r.orig_img.copy()
+        color = (0, 255, 0) if is_ok else (0, 0, 255)
+        cv2.putText(img, pred_label, (10, 40), cv2.FONT_HERSHEY_SIMPLEX,
+                    1.2, color, 3, cv2.LINE_AA)
+    cv2.imwrite(str(out_dir / f"{img_file.stem}__{pred_label}.png"), img)
 
 
+class ModelRun:
+    """One model's counters over the run."""
+
+    def __init__(self, model_path: Path):
+        self.model_path = model_path
+        self.model, self.task, self.names = load_model(model_path)
+        self.ok_count, self.nok_count = 0, 0
+        self.seconds = 0.0
+        self.out_dir = OUTPUT_ROOT / model_path.stem
+        if SAVE_VIZ:
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+
+    def warmup(self, frame):
+        """The first predict call sets up the predictor; keep it out of the images/s figure."""
+        self.model.predict([frame], conf=CONF, iou=IOU, save=False, verbose=False)
+
+    def predict(self, files, frames):
+        """Counts (and optionally saves) the batch; returns the pred_label of every image."""
+        start = time.perf_counter()
+        results = self.model.predict(frames, conf=CONF, iou=IOU, save=False, verbose=False)
+        labels = [label_result(r, self.task, self.names) for r in results]
+        self.seconds += time.perf_counter() - start
+
+        for img_file, r, (is_ok, pred_label) in zip(files, results, labels):
+            if is_ok:
+                self.ok_count += 1
+            else:
+                self.nok_count += 1
             if SAVE_VIZ:
-                if cv2 is None:
-                    raise RuntimeError("OpenCV (cv2) required for save_viz=True")
-                img = r.orig_img.copy()
-                color = (0, 255, 0) if is_ok else (0, 0, 255)
-                cv2.putText(img, pred_label, (10, 40), cv2.FONT_HERSHEY_SIMPLEX,
-                            1.2, color, 3, cv2.LINE_AA)
-                cv2.imwrite(str(out_dir / f"{img_file.stem}__{pred_label}.png"), img)
+                save_viz(r, self.task, self.out_dir, img_file, is_ok, pred_label)
+        return [pred_label for _, pred_label in labels]
 
-        else:
-            raise ValueError(f"Unsupported YOLO task: {task}")
+    def summary(self):
+        images = self.ok_count + self.nok_count
+        rate = images / self.seconds if self.seconds else 0.0
+        return f"Model: {self.model_path.stem} → OK: {self.ok_count} | NOK: {self.nok_count} | {rate:.1f} images/s"
+
+
+def run_inference(model_files, images_path: Path):
+    runs = [ModelRun(m) for m in model_files]
+
+    start = time.perf_counter()
+    images = 0
+    for files, frames in iter_batches(iter_images(images_path)):
+        if not images:
+            for run in runs:
+                run.warmup(frames[0])
+        images += len(files)
+        for run in runs:
+            run.predict(files, frames)
+    elapsed = time.perf_counter() - start
+
+    for run in runs:
+        print(run.summary())
+    print(f"{images} images × {len(runs)} model(s) in {elapsed:.1f} s")
+
+
+def name_hash(name):
+    return int.from_bytes(hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def manifest_files(manifest_dir: Path):
+    return sorted(manifest_dir.glob("manifest.*.tsv"))
+
+
+def open_manifest(path: Path, header):
+    """Append handle on a manifest, after dropping a line cut off by a crash; the header must match."""
+    if path.exists():
+        with open(path, "rb+") as f:
+            data_end = f.seek(0, os.SEEK_END)
+            f.seek(max(0, data_end - 65536))
+            tail = f.read()
+            if tail and not tail.endswith(b"\n"):
+                f.truncate(data_end - len(tail) + tail.rfind(b"\n") + 1)
+    f = open(path, "a", encoding="utf-8")
+    if f.tell() == 0:
+        f.write(header)
+        f.flush()
+    return f
+
+
+def read_manifests(manifest_dir: Path, header):
+    """Yields the rows of every manifest (split on tabs), checking each was written for the same models."""
+    for path in manifest_files(manifest_dir):
+        with open(path, "r", encoding="utf-8") as f:
+            first = f.readline()
+            if first and first != header:
+                raise ValueError(f"{path} was written for other models ({first.strip()}); "
+                                 f"move it away or set MANIFEST_DIR to start a new run")
+            for line in f:
+                if line.endswith("\n"):
+                    yield line.rstrip("\n").split("\t")
+
+
+def build_done_set(manifest_dir: Path, header):
+    """Sorted uint64 hashes of every file name already in the manifests, saved for the workers to mmap."""
+    hashes = array("Q")
+    for row in read_manifests(manifest_dir, header):
+        hashes.append(name_hash(row[0]))
+    done = np.unique(np.frombuffer(hashes, dtype=np.uint64)) if hashes else np.zeros(0, dtype=np.uint64)
+    done_path = manifest_dir / "done.npy"
+    np.save(done_path, done)
+    return done_path, len(done)
+
+
+def run_shard(shard, shards, model_files, images_path, manifest_dir, header, torch_threads):
+    """Worker process: every image whose name hash falls in this shard and is not done yet."""
+    import torch
+    torch.set_num_threads(torch_threads)
+    cv2.setNumThreads(1)
+    logging.getLogger('ultralytics').setLevel(logging.ERROR)
+
+    done = np.load(manifest_dir / "done.npy", mmap_mode="r")
+
+    def pending():
+        for img_file in iter_images(images_path):
+            h = name_hash(img_file.name)
+            if h % shards != shard:
+                continue
+            index = np.searchsorted(done, np.uint64(h))
+            if index < len(done) and done[index] == h:
+                continue
+            yield img_file
+
+    runs = [ModelRun(m) for m in model_files]
+    images = 0
+    with open_manifest(manifest_dir / f"manifest.{shard}.tsv", header) as manifest:
+        for files, frames in iter_batches(pending(), threads=max(1, DECODE_THREADS // shards)):
+            if not images:
+                for run in runs:
+                    run.warmup(frames[0])
+            labels = [run.predict(files, frames) for run in runs]
+            manifest.writelines("\t".join((img_file.name, *row)) + "\n" for img_file, row in zip(files, zip(*labels)))
+            manifest.flush()
+            images += len(files)
+            if images % 1000 < len(files):
+                print(f"Shard {shard}: {images} images")
+    return images, [run.seconds for run in runs]
+
+
+def run_sharded(model_files, images_path: Path, workers):
+    MANIFEST_DIR.mkdir(parents=True, exist_ok=True)
+    stems = [m.stem for m in model_files]
+    header = "\t".join(("file", *stems)) + "\n"
+    _, done_count = build_done_set(MANIFEST_DIR, header)
+    torch_threads = TORCH_THREADS or max(1, (os.cpu_count() or 1) // workers)
+    print(f"{done_count} images already in {MANIFEST_DIR}; "
+          f"running {workers} worker(s) × {torch_threads} torch thread(s)")
+
+    start = time.perf_counter()
+    # spawn: workers must not inherit the parent's torch threads (and it is the only option on Windows).
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(run_shard, shard, workers, model_files, images_path, MANIFEST_DIR, header,
+                               torch_threads) for shard in range(workers)]
+        shard_results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    # Totals over the whole manifest, previous runs included, streamed rather than held.
+    ok_counts, nok_counts = [0] * len(stems), [0] * len(stems)
+    for row in read_manifests(MANIFEST_DIR, header):
+        for index, label in enumerate(row[1:]):
+            if label.startswith("OK"):
+                ok_counts[index] += 1
+            else:
+                nok_counts[index] += 1
+
+    images = sum(count for count, _ in shard_results)
+    for index, stem in enumerate(stems):
+        # Workers run in parallel, so a model's throughput is the sum of its per-shard rates.
+        rate = sum(count / seconds[index] for count, seconds in shard_results if seconds[index])
+        print(f"Model: {stem} → OK: {ok_counts[index]} | NOK: {nok_counts[index]} | {rate:.1f} images/s")
+    print(f"{images} new images × {len(stems)} model(s) in {elapsed:.1f} s, results in {MANIFEST_DIR}")
 
-    print(f"Model: {model_path.stem} → OK: {ok_count} | NOK: {nok_count}")
 
 def main():
     if not MODEL_PATH.exists():
@@ -134,8 +328,10 @@ def main():
     if not IMAGES_PATH.exists():
         raise FileNotFoundError(f"Images path not found: {IMAGES_PATH}")
 
-    for mfile in model_files:
-        run_inference(mfile, IMAGES_PATH)
+    if WORKERS > 0:
+        run_sharded(model_files, IMAGES_PATH, WORKERS)
+    else:
+        run_inference(model_files, IMAGES_PATH)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,164 @@
+"""
+Post-training INT8 quantization of a trained classifier for CPU-only line PCs.
+- Exports best.pt to ONNX (cached next to the model) and statically quantizes it to INT8 with onnxruntime,
+  calibrating on a subset of the dataset folder.
+- Compares the INT8 graph against the float graph on a disjoint held-out set: top-1 agreement,
+  per-image latency (mean/p50/p95) and file size.
+- Writes <stem>.<hash>.int8.onnx with a .json sidecar holding the class names and the report.
+  The app's onnxruntime backend refuses the artifact if the agreement is below
+  "min_quantized_agreement" in config.json; this script exits non-zero in that case as well.
+Needs: pip install onnxruntime onnx
+"""
+
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import onnxruntime
+from onnxruntime.quantization import CalibrationDataReader, QuantFormat, quantize_static
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+APP_DIR = Path(__file__).resolve().parent.parent / "App files"
+sys.path.insert(0, str(APP_DIR))
+
+from image_io import decode_frame, IMAGE_EXTENSIONS
+from inference_backends import OpenCVDnnBackend, classify_preprocess
+
+
+# ==============================
+# USER CONFIGURABLE PARAMETERS
+# ==============================
+MODEL_PATH        = Path(r"path")  # trained best.pt
+DATASET_PATH      = Path(r"path")  # classification dataset folder (train/ and val/ class folders, or flat)
+CALIBRATION_SPLIT = "train"        # used if DATASET_PATH/<split> exists
+HOLDOUT_SPLIT     = "val"
+CALIBRATION_SIZE  = 200
+HOLDOUT_SIZE      = 500
+CONFIG_PATH       = APP_DIR / "config.json"
+SEED              = 0
+
+
+def list_images(folder):
+    return sorted(p for p in folder.rglob("*") if p.suffix.lower() in IMAGE_EXTENSIONS)
+
+
+def split_dataset():
+    """Calibration and held-out images never overlap, so the agreement is measured on unseen data."""
+    rng = random.Random(SEED)
+    calibration_dir = DATASET_PATH / CALIBRATION_SPLIT
+    holdout_dir = DATASET_PATH / HOLDOUT_SPLIT
+
+    if calibration_dir.is_dir() and holdout_dir.is_dir():
+        calibration, holdout = list_images(calibration_dir), list_images(holdout_dir)
+        rng.shuffle(calibration)
+        rng.shuffle(holdout)
+    else:
+        images = list_images(DATASET_PATH)
+        rng.shuffle(images)
+        calibration, holdout = images[:len(images) // 2], images[len(images) // 2:]
+
+    return calibration[:CALIBRATION_SIZE], holdout[:HOLDOUT_SIZE]
+
+
+class CalibrationReader(CalibrationDataReader):
+    """onnxruntime CalibrationDataReader over the calibration images, one preprocessed image per call."""
+
+    def __init__(self, input_name, image_paths, imgsz):
+        self.input_name = input_name
+        self.image_paths = iter(image_paths)
+        self.imgsz = imgsz
+
+    def get_next(self):
+        for path in self.image_paths:
+            frame = decode_frame(str(path))
+            if frame is not None:
+                return {self.input_name: classify_preprocess([frame], self.imgsz)}
+        return None
+
+
+def quantize(float_path, int8_path, calibration, imgsz):
+    input_name = onnxruntime.InferenceSession(float_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    reader = CalibrationReader(input_name, calibration, imgsz)
+
+    prepared_path = f"{os.path.splitext(int8_path)[0]}.prep.onnx"
+    quant_pre_process(float_path, prepared_path)
+    try:
+        # Only the heavy layers are quantized; softmax/attention stay float so the probabilities keep their resolution.
+        quantize_static(prepared_path, int8_path, reader, quant_format=QuantFormat.QDQ, per_channel=True,
+                        op_types_to_quantize=["Conv", "MatMul", "Gemm"])
+    finally:
+        os.remove(prepared_path)
+
+
+def evaluate(session, frames, imgsz):
+    input_name = session.get_inputs()[0].name
+    for frame in frames[:3]:
+        session.run(None, {input_name: classify_preprocess([frame], imgsz)})
+
+    top1, latencies = [], []
+    for frame in frames:
+        batch = classify_preprocess([frame], imgsz)
+        start = time.perf_counter()
+        probs = session.run(None, {input_name: batch})[0]
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        top1.append(int(np.argmax(probs)))
+    return np.array(top1), np.array(latencies)
+
+
+def latency_summary(latencies):
+    return {
+        "mean_ms": round(float(latencies.mean()), 3),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+    }
+
+
+def main():
+    with open(CONFIG_PATH, "r") as f:
+        min_agreement = json.load(f).get("min_quantized_agreement", 0.99)
+
+    float_path, metadata = OpenCVDnnBackend.export_onnx(str(MODEL_PATH))
+    int8_path = f"{os.path.splitext(float_path)[0]}.int8.onnx"
+    imgsz = metadata["imgsz"]
+
+    calibration, holdout = split_dataset()
+    print(f"Calibrating on {len(calibration)} images, evaluating on {len(holdout)} held-out images")
+    quantize(float_path, int8_path, calibration, imgsz)
+
+    frames = [frame for frame in (decode_frame(str(p)) for p in holdout) if frame is not None]
+    providers = ["CPUExecutionProvider"]
+    float_top1, float_latency = evaluate(onnxruntime.InferenceSession(float_path, providers=providers), frames, imgsz)
+    int8_top1, int8_latency = evaluate(onnxruntime.InferenceSession(int8_path, providers=providers), frames, imgsz)
+
+    report = {
+        "holdout_images": len(frames),
+        "calibration_images": len(calibration),
+        "top1_agreement": round(float(np.mean(float_top1 == int8_top1)), 5),
+        "min_agreement": min_agreement,
+        "float_latency": latency_summary(float_latency),
+        "int8_latency": latency_summary(int8_latency),
+        "model_size_mb": {
+            "pt": round(os.path.getsize(MODEL_PATH) / 1e6, 3),
+            "float_onnx": round(os.path.getsize(float_path) / 1e6, 3),
+            "int8_onnx": round(os.path.getsize(int8_path) / 1e6, 3),
+        },
+    }
+    report["accepted"] = report["top1_agreement"] >= min_agreement
+
+    sidecar = {"names": metadata["names"], "imgsz": imgsz, "source": str(MODEL_PATH), "quantization": report}
+    with open(f"{os.path.splitext(int8_path)[0]}.json", "w") as f:
+        json.dump(sidecar, f, indent=4)
+
+    print(json.dumps(report, indent=4))
+    if not report["accepted"]:
+        print(f"\nINT8 model REFUSED: top-1 agreement {report['top1_agreement']:.2%} < {min_agreement:.2%}")
+        sys.exit(1)
+    print(f"\nINT8 model written to {int8_path}; select it in the app to use it.")
+
+
+if __name__ == "__main__":
+    main()
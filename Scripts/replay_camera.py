@@ -0,0 +1,293 @@
+"""
+Camera replay: streams a folder of images into the app's watch folder like a line camera would,
+and reports what the running app measured.
+
+Schedule (pick one):
+- --rate N: N images/s, evenly spaced (use a high rate for burst tests).
+- --schedule: the capture times in the Pic_YYYY_MM_DD_HHMMSS_N file names, replayed --speed times
+  faster than recorded, with gaps longer than --max-gap seconds shortened to --max-gap.
+Writes: --chunks K splits every file into K writes, --chunk-delay-ms apart, so the app sees a file that
+is still being written (is_image_fully_written and the ImageHandler debounce/retry path).
+
+While replaying, the app's metrics endpoint (metrics_port in config.json) is polled for queue depths. Once
+the app has caught up, the tool reports:
+- per-image latency from end of write to result, from the result store (result_store_path);
+- images with no result after --drain-timeout;
+- the app's own end-to-end quantiles and drop counters, and how often the decode queue was full (queue_size),
+  i.e. ready files were held back by backpressure (the peak "watcher" depth shows how many).
+Replayed files are renamed r<run>_<index>_<original name>, so repeated runs are never skipped as
+already processed. The app must already be running (app_ui.py or headless_service.py).
+
+    python replay_camera.py --source ../App\\ files/destination_images/single_folder --rate 5 --chunks 4
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+import numpy as np
+
+APP_DIR = Path(__file__).resolve().parent.parent / "App files"
+sys.path.insert(0, str(APP_DIR))
+
+from backlog_scanner import capture_sort_key
+from image_io import IMAGE_EXTENSIONS
+
+
+METRIC_LINE = re.compile(r'^(\w+)(?:\{(.*)\})? ([-+0-9.eE]+|NaN)$')
+LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+LABEL_ESCAPE = re.compile(r'\\(.)')
+
+
+def positive_float(text):
+    value = float(text)
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {text}")
+    return value
+
+
+def app_path(path):
+    """Relative paths in config.json are relative to the app folder."""
+    return path if os.path.isabs(path) else str(APP_DIR / path)
+
+
+def load_source(folder, schedule, rate, speed, max_gap, count):
+    """[(path, offset seconds from start)] in capture order."""
+    with os.scandir(folder) as it:
+        entries = sorted((entry for entry in it if entry.name.lower().endswith(IMAGE_EXTENSIONS)), key=capture_sort_key)
+    if count:
+        entries = (entries * (count // len(entries) + 1))[:count]
+
+    if not schedule:
+        return [(entry.path, index / rate) for index, entry in enumerate(entries)]
+
+    offsets = [0.0]
+    for previous, current in zip(entries, entries[1:]):
+        gap = max(0.0, capture_sort_key(current)[0] - capture_sort_key(previous)[0])
+        offsets.append(offsets[-1] + min(gap, max_gap) / speed)
+    return [(entry.path, offset) for entry, offset in zip(entries, offsets)]
+
+
+def write_file(source, target, chunks, chunk_delay):
+    """Write like a camera: in chunks with pauses, so the file is visibly incomplete for a while."""
+    with open(source, "rb") as f:
+        data = f.read()
+    size = len(data)
+    with open(target, "wb") as f:
+        for index in range(chunks):
+            f.write(data[index * size // chunks:(index + 1) * size // chunks])
+            f.flush()
+            if index < chunks - 1:
+                time.sleep(chunk_delay)
+
+
+def read_metrics(url):
+    """{(name, frozenset(labels)): value} from a Prometheus text endpoint, or None if unreachable."""
+    try:
+        with urllib.request.urlopen(url, timeout=2.0) as response:
+            text = response.read().decode("utf-8")
+    except OSError:
+        return None
+    samples = {}
+    for line in text.splitlines():
+        match = METRIC_LINE.match(line)
+        if match:
+            labels = frozenset((name, LABEL_ESCAPE.sub(lambda m: "\n" if m.group(1) == "n" else m.group(1), value))
+                               for name, value in LABEL.findall(match.group(2) or ""))
+            samples[(match.group(1), labels)] = float(match.group(3))
+    return samples
+
+
+def app_total_latency(metrics):
+    """The app's own end-to-end quantiles (watcher event to displayed) over its recent window, per line."""
+    totals = {}
+    for (name, labels), value in (metrics or {}).items():
+        labels = dict(labels)
+        if name == "inspection_stage_latency_ms" and labels.get("stage") == "total":
+            totals.setdefault(labels["line"], {})[f"p{float(labels['quantile']) * 100:g}"] = round(value, 1)
+    return totals
+
+
+def counter_delta(before, after, name):
+    deltas = {}
+    for (metric, labels), value in (after or {}).items():
+        if metric == name:
+            delta = value - (before or {}).get((metric, labels), 0.0)
+            if delta:
+                deltas[",".join(f"{k}={v}" for k, v in sorted(labels))] = int(delta)
+    return deltas
+
+
+class QueueSampler:
+    """Polls inspection_queue_depth while the replay runs."""
+
+    def __init__(self, url, queue_size, interval=0.25):
+        self.url = url
+        self.queue_size = queue_size
+        self.interval = interval
+        self.samples = 0
+        self.full_samples = 0
+        self.peaks = {}
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            metrics = read_metrics(self.url)
+            if metrics is None:
+                continue
+            self.samples += 1
+            full = False
+            for (name, labels), value in metrics.items():
+                if name != "inspection_queue_depth":
+                    continue
+                labels = dict(labels)
+                key = f"{labels.get('line')}/{labels.get('stage')}"
+                self.peaks[key] = max(self.peaks.get(key, 0), int(value))
+                full = full or (labels.get("stage") == "decode" and value >= self.queue_size)
+            self.full_samples += full
+
+    def report(self):
+        return {
+            "samples": self.samples,
+            "decode_queue_full_fraction": round(self.full_samples / self.samples, 3) if self.samples else None,
+            "peak_depths": self.peaks,
+        }
+
+
+def result_latencies(db_path, written, drain_timeout):
+    """Wait until every written file has a result row (or the timeout), then (latencies ms, missing names)."""
+    deadline = time.time() + drain_timeout
+    found = {}
+    while True:
+        connection = sqlite3.connect(db_path, timeout=10.0)
+        try:
+            names = list(written)
+            for start in range(0, len(names), 500):
+                chunk = names[start:start + 500]
+                rows = connection.execute(
+                    f"SELECT file, MIN(recorded_at) FROM results WHERE file IN ({','.join('?' * len(chunk))}) "
+                    "GROUP BY file", chunk).fetchall()
+                found.update(rows)
+        finally:
+            connection.close()
+        if len(found) == len(written) or time.time() > deadline:
+            break
+        time.sleep(1.0)
+
+    latencies = [(found[name] - written[name]) * 1000.0 for name in found]
+    missing = sorted(set(written) - set(found))
+    return latencies, missing
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"count": len(values), "p50": round(p50, 1), "p95": round(p95, 1), "p99": round(p99, 1),
+            "max": round(max(values), 1)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay camera images into the watch folder and report app-side latency.")
+    parser.add_argument("--source", required=True, help="folder of images to replay")
+    parser.add_argument("--config", default=str(APP_DIR / "config.json"), help="the running app's config.json")
+    parser.add_argument("--watch", default=None, help="target folder (default: watch_single_folder_path)")
+    timing = parser.add_mutually_exclusive_group(required=True)
+    timing.add_argument("--rate", type=positive_float, help="images per second")
+    timing.add_argument("--schedule", action="store_true", help="replay the capture times in the file names")
+    parser.add_argument("--speed", type=positive_float, default=1.0, help="--schedule: replay this many times faster")
+    parser.add_argument("--max-gap", type=float, default=10.0, help="--schedule: cap idle gaps at this many seconds")
+    parser.add_argument("--count", type=int, default=0, help="images to write (cycles the source); 0 = each once")
+    parser.add_argument("--chunks", type=int, default=1, help="write every file in this many pieces")
+    parser.add_argument("--chunk-delay-ms", type=float, default=50.0, help="pause between pieces")
+    parser.add_argument("--drain-timeout", type=float, default=120.0, help="seconds to wait for the app to catch up")
+    parser.add_argument("--output", default=None, help="also write the report here as JSON")
+    args = parser.parse_args(argv)
+
+    with open(args.config, "r") as f:
+        config = json.load(f)
+    watch = args.watch or app_path(config["watch_single_folder_path"])
+    os.makedirs(watch, exist_ok=True)
+    metrics_url = f"http://{config.get('metrics_host', '127.0.0.1')}:{config['metrics_port']}/metrics" \
+        if config.get("metrics_port") else None
+    db_path = app_path(config["result_store_path"]) if config.get("result_store_path") else None
+
+    plan = load_source(args.source, args.schedule, args.rate, args.speed, args.max_gap, args.count)
+    if not plan:
+        raise FileNotFoundError(f"No images found in {args.source}")
+    run = time.strftime("%H%M%S")
+    print(f"Replaying {len(plan)} images into {watch} over {plan[-1][1]:.1f} s "
+          f"({args.chunks} chunk(s) per file, {args.chunk_delay_ms:.0f} ms apart)")
+
+    metrics_before = read_metrics(metrics_url) if metrics_url else None
+    if metrics_url and metrics_before is None:
+        print(f"Metrics endpoint {metrics_url} not reachable; queue and drop counters are skipped.")
+    sampler = QueueSampler(metrics_url, config.get("queue_size", 0)) if metrics_before is not None else None
+    if sampler:
+        sampler.thread.start()
+
+    written = {}
+    lateness = []
+    writers = []
+    lock = threading.Lock()
+
+    def write(source, name):
+        write_file(source, os.path.join(watch, name), args.chunks, args.chunk_delay_ms / 1000.0)
+        with lock:
+            written[name] = time.time()
+
+    start = time.perf_counter()
+    for index, (source, offset) in enumerate(plan):
+        delay = start + offset - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        lateness.append(max(0.0, -delay) * 1000.0)
+        name = f"r{run}_{index:05d}_{os.path.basename(source)}"
+        # One thread per file: chunked writes overlap like back-to-back camera triggers do.
+        writer = threading.Thread(target=write, args=(source, name), daemon=True)
+        writer.start()
+        writers.append(writer)
+    for writer in writers:
+        writer.join()
+    replay_s = time.perf_counter() - start
+
+    report = {
+        "images": len(plan),
+        "replay_s": round(replay_s, 2),
+        "offered_rate": round(len(plan) / replay_s, 2) if replay_s else None,
+        "write_lateness_ms": percentiles(lateness),
+    }
+    if db_path and os.path.exists(db_path):
+        print(f"Waiting up to {args.drain_timeout:.0f} s for results...")
+        latencies, missing = result_latencies(db_path, written, args.drain_timeout)
+        report["latency_ms"] = percentiles(latencies)
+        report["no_result"] = len(missing)
+        report["no_result_examples"] = missing[:10]
+    else:
+        print("No result store (result_store_path), so per-image latency and missing results are not measured.")
+
+    if sampler:
+        sampler.stop_event.set()
+        sampler.thread.join()
+        metrics_after = read_metrics(metrics_url)
+        report["app_drops"] = counter_delta(metrics_before, metrics_after, "inspection_drops_total")
+        report["app_images"] = counter_delta(metrics_before, metrics_after, "inspection_images_total")
+        report["app_total_ms"] = app_total_latency(metrics_after)
+        report["queues"] = sampler.report()
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()